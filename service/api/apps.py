@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        """Drops the tag cache on every change of the tags
+        and records the queries of the requests."""
+        from api.cache import on_tag_changed
+        from api.middleware import install_query_recorder
+
+        post_save.connect(on_tag_changed, sender='posts.Tag')
+        post_delete.connect(on_tag_changed, sender='posts.Tag')
+        connection_created.connect(install_query_recorder)
@@ -0,0 +1,131 @@
+import time
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from api.cache import aget_cached, aget_generations, count_cache_event
+from api.mixins import (
+    get_cached_response,
+    get_validator_response,
+    is_conditional
+)
+
+User = get_user_model()
+
+
+def accepts_json(request, kwargs):
+    """Returns True if the client gets the JSON body from the sync
+    view too, and not the browsable API or another format."""
+    accept = request.META.get('HTTP_ACCEPT', '*/*')
+    return (
+        'format' not in kwargs
+        and 'format' not in request.GET
+        and 'text/html' not in accept
+        and ('*/*' in accept or 'application/json' in accept)
+    )
+
+
+async def aauthenticate(request):
+    """Returns the active user of the JWT of the request loaded
+    by the async ORM with the token, or None if the request is left
+    to the sync view to authenticate or to reject."""
+    force_user = getattr(request, '_force_auth_user', None)
+    if force_user is not None:
+        return force_user, getattr(request, '_force_auth_token', None)
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+    except (APIException, KeyError):
+        return None
+    user = await User.objects.filter(
+        **{api_settings.USER_ID_FIELD: user_id},
+        is_active=True
+    ).afirst()
+    if user is None:
+        return None
+    return user, validated_token
+
+
+async def is_async_read(request, kwargs):
+    """Returns True if the request can be served by the async path.
+    The authenticated user is forced on the request, so the sync view
+    does not load it again on the cache miss."""
+    if request.method != 'GET' or not accepts_json(request, kwargs):
+        return False
+    user_auth_tuple = await aauthenticate(request)
+    if user_auth_tuple is None:
+        return False
+    request._force_auth_user, request._force_auth_token = user_auth_tuple
+    return True
+
+
+async def read_list(viewset, request, *args, **kwargs):
+    """Returns the cached page read by the async cache API,
+    or None if it is missing."""
+    generations = await aget_generations(viewset.get_cache_generation_names())
+    if generations is None:
+        return None
+    cache_entry = await cache.aget(
+        viewset.get_list_cache_name(request, generations)
+    )
+    if cache_entry is None:
+        return None
+    count_cache_event('redis_hits')
+    return get_cached_response(request, cache_entry)
+
+
+async def read_detail(viewset, request, *args, **kwargs):
+    """Returns the fresh cached instance read by the async cache API,
+    or the 304 response by the validators loaded by the async ORM,
+    or None if the instance is to be loaded by the sync view."""
+    lookup_value = viewset.get_lookup_value()
+    cache_entry = await aget_cached(viewset.get_obj_cache_name(lookup_value))
+    if cache_entry is not None and cache_entry['stale_at'] > time.time():
+        return get_cached_response(request, cache_entry)
+    if not is_conditional(request):
+        return None
+    queryset = viewset.get_validator_queryset()
+    if queryset is None:
+        return None
+    instance = await queryset.filter(
+        **{viewset.lookup_field: lookup_value}
+    ).afirst()
+    if instance is None:
+        return None
+    etag, last_modified = viewset.get_validators(instance)
+    return get_validator_response(request, etag, last_modified)
+
+
+def get_async_read_view(sync_view, actions):
+    """Returns the async view serving the list or retrieve action
+    from the cache without the thread, the other requests and
+    the cache misses are passed to the sync view in the thread."""
+    read = {'list': read_list, 'retrieve': read_detail}.get(
+        actions.get('get')
+    )
+    if read is None:
+        return sync_view
+
+    async def view(request, *args, **kwargs):
+        if await is_async_read(request, kwargs):
+            viewset = sync_view.cls(kwargs=kwargs, **sync_view.initkwargs)
+            response = await read(viewset, request, *args, **kwargs)
+            if response is not None:
+                patch_vary_headers(response, ('Accept',))
+                return response
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    return update_wrapper(view, sync_view)
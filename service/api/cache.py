@@ -0,0 +1,325 @@
+import os
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from functools import lru_cache
+from hashlib import md5
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from app.db_routers import pin_primary
+from posts.compression import compress, decompress
+
+cache_stats = Counter()
+request_cache_stats = ContextVar('request_cache_stats', default=None)
+
+
+def count_cache_event(event):
+    """Counts the cache event in the process-wide stats
+    and in the stats of the current request, if any."""
+    cache_stats[event] += 1
+    stats = request_cache_stats.get()
+    if stats is not None:
+        stats[event] += 1
+
+
+@lru_cache
+def get_redis():
+    """Returns the Redis client for the commands
+    not covered by the Django cache API."""
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+class LocalCache:
+    """The per-process LRU cache bounded by the number of entries
+    and their total size, every entry lives for the same short time."""
+
+    def __init__(self, max_entries, max_bytes, lifetime):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lifetime = lifetime
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the value of the key or None if it is missing
+        or expired, marks the key as the most recently used."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, size, expire_at = entry
+            if expire_at <= time.monotonic():
+                self._pop(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size, lifetime=None):
+        """Sets the value of the key and evicts the least recently
+        used entries, while the cache is beyond its bounds."""
+        if size > self.max_bytes:
+            return
+        if lifetime is None or lifetime > self.lifetime:
+            lifetime = self.lifetime
+        with self.lock:
+            self._pop(key)
+            self.entries[key] = (value, size, time.monotonic() + lifetime)
+            self.size += size
+            while (
+                len(self.entries) > self.max_entries
+                or self.size > self.max_bytes
+            ):
+                self._pop(next(iter(self.entries)))
+
+    def delete(self, key):
+        """Deletes the key if it is present."""
+        with self.lock:
+            self._pop(key)
+
+    def clear(self):
+        """Deletes all the keys."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+class TagCache:
+    """The process-wide map of all the tags by their ids. The table
+    of the tags is tiny and rarely changed, so it is loaded at once
+    and dropped on a change of the tags in any worker."""
+
+    def __init__(self):
+        self.tags = None
+        self.deleted_ids = set()
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get_tags(self, tag_ids=()):
+        """Returns the map of the tags, loading it if it is missing.
+        The map lacking some of the tag_ids is loaded again once, as
+        they could be created after the load, the ids missing after
+        that are of the deleted tags. The map is loaded from the
+        primary, the replica could lag behind the change of the tags,
+        and the map loaded while the tags were changed is not kept."""
+        from posts.models import Tag
+
+        tags = self.tags
+        if tags is not None and self.deleted_ids.issuperset(
+            tag_id for tag_id in tag_ids if tag_id not in tags
+        ):
+            return tags
+        start_invalidation_listener()
+        generation = self.generation
+        tags = Tag.objects.using(DEFAULT_DB_ALIAS).only(
+            'id',
+            'name'
+        ).in_bulk()
+        with self.lock:
+            if self.generation == generation:
+                self.tags = tags
+                self.deleted_ids.update(
+                    tag_id for tag_id in tag_ids if tag_id not in tags
+                )
+        return tags
+
+    def clear(self):
+        """Drops the map, it is loaded again on the next use."""
+        with self.lock:
+            self.generation += 1
+            self.tags = None
+            self.deleted_ids = set()
+
+
+local_cache = LocalCache(
+    settings.LOCAL_CACHE_MAX_ENTRIES,
+    settings.LOCAL_CACHE_MAX_BYTES,
+    settings.LOCAL_CACHE_LIFETIME
+)
+tag_cache = TagCache()
+_listener_pid = None
+
+
+def _listen_invalidations():
+    """Deletes the local cache keys published by the other
+    workers, the whole local cache and the tag cache are cleared
+    after a reconnect because the messages could be missed."""
+    while True:
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(settings.LOCAL_CACHE_CHANNEL)
+            local_cache.clear()
+            tag_cache.clear()
+            for message in pubsub.listen():
+                for key in message['data'].decode().split('\n'):
+                    if key == settings.TAG_CACHE_KEY:
+                        tag_cache.clear()
+                    local_cache.delete(key)
+        except redis.RedisError:
+            time.sleep(1)
+
+
+def start_invalidation_listener():
+    """Starts the invalidation listener once in every worker process."""
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    _listener_pid = os.getpid()
+    threading.Thread(target=_listen_invalidations, daemon=True).start()
+
+
+def get_cached(key):
+    """Returns the value of the key from the local cache,
+    falling back to Redis, or None if it is missing in both."""
+    if settings.LOCAL_CACHE_ENABLED:
+        start_invalidation_listener()
+        value = local_cache.get(key)
+        if value is not None:
+            count_cache_event('local_hits')
+            return value
+        count_cache_event('local_misses')
+    value = cache.get(key)
+    if value is None:
+        count_cache_event('redis_misses')
+        return None
+    count_cache_event('redis_hits')
+    if settings.LOCAL_CACHE_ENABLED:
+        local_cache.set(key, value, len(pickle.dumps(value)))
+    return value
+
+
+async def aget_cached(key):
+    """The async version of get_cached() using
+    the async cache API for Redis."""
+    if settings.LOCAL_CACHE_ENABLED:
+        start_invalidation_listener()
+        value = local_cache.get(key)
+        if value is not None:
+            count_cache_event('local_hits')
+            return value
+        count_cache_event('local_misses')
+    value = await cache.aget(key)
+    if value is None:
+        count_cache_event('redis_misses')
+        return None
+    count_cache_event('redis_hits')
+    if settings.LOCAL_CACHE_ENABLED:
+        local_cache.set(key, value, len(pickle.dumps(value)))
+    return value
+
+
+def set_cached(key, value, timeout):
+    """Sets the value of the key in Redis and in the local cache."""
+    cache.set(key, value, timeout)
+    if settings.LOCAL_CACHE_ENABLED:
+        local_cache.set(key, value, len(pickle.dumps(value)), timeout)
+
+
+def delete_cached(keys):
+    """Deletes the keys in Redis and in the local caches
+    of all the workers in one call each. The entries are refilled
+    from the primary, until the replicas catch up the change."""
+    cache.delete_many(keys)
+    pin_primary(keys)
+    if settings.LOCAL_CACHE_ENABLED:
+        for key in keys:
+            local_cache.delete(key)
+        get_redis().publish(
+            settings.LOCAL_CACHE_CHANNEL,
+            '\n'.join(keys)
+        )
+
+
+def invalidate_tag_cache():
+    """Drops the tag cache of this worker and of all the others."""
+    tag_cache.clear()
+    get_redis().publish(settings.LOCAL_CACHE_CHANNEL, settings.TAG_CACHE_KEY)
+
+
+def on_tag_changed(**kwargs):
+    """Drops the tag caches on the change of the tag and once more
+    after the commit, as they could be loaded by other requests
+    before the change was committed."""
+    invalidate_tag_cache()
+    transaction.on_commit(invalidate_tag_cache)
+
+
+def pack_body(body):
+    """Returns the cache entry fields of the rendered body,
+    the body is gzipped if it is large enough."""
+    encoding, body = compress(body, settings.CACHE_COMPRESS_MIN_SIZE)
+    return {'body': body, 'encoding': encoding}
+
+
+def unpack_body(cache_entry):
+    """Returns the rendered body of the cache entry."""
+    return decompress(cache_entry['encoding'], cache_entry['body'])
+
+
+def get_etag(body):
+    """Returns the strong ETag of the rendered body."""
+    return f'"{md5(body).hexdigest()}"'
+
+
+def get_gzip_etag(etag):
+    """Returns the ETag of the gzipped representation."""
+    return f'{etag[:-1]}-gzip"'
+
+
+def get_obj_cache_name(cache_base_name, pk, scope=None):
+    """Returns the cache name of the model instance,
+    the scope separates the entries of different users."""
+    if scope is None:
+        return f'{cache_base_name}_cache/{pk}'
+    return f'{cache_base_name}_cache/{scope}/{pk}'
+
+
+def delete_obj_caches(cache_base_name, pks, scope=None):
+    """Deletes the cache entries of the model instances in one call."""
+    delete_cached(
+        [get_obj_cache_name(cache_base_name, pk, scope) for pk in pks]
+    )
+
+
+def get_generations(generation_names):
+    """Returns the current values of the generation counters,
+    starting the missing ones from the current time so that
+    an evicted counter never repeats an old value."""
+    generations = cache.get_many(generation_names)
+    for name in generation_names:
+        if name not in generations:
+            generation = time.time_ns()
+            if not cache.add(name, generation, None):
+                generation = cache.get(name, generation)
+            generations[name] = generation
+    return [generations[name] for name in generation_names]
+
+
+async def aget_generations(generation_names):
+    """Returns the current values of the generation counters
+    by the async cache API, or None if some of them are missing."""
+    generations = await cache.aget_many(generation_names)
+    if len(generations) < len(generation_names):
+        return None
+    return [generations[name] for name in generation_names]
+
+
+def bump_generation(generation_name):
+    """Increments the generation counter, which makes all the
+    cached lists depending on it unreachable."""
+    try:
+        cache.incr(generation_name)
+    except ValueError:
+        cache.add(generation_name, time.time_ns(), None)
+    pin_primary([generation_name])
@@ -0,0 +1,43 @@
+from django.conf import settings
+
+from api.cache import get_redis
+
+
+def schedule_report_expiry(reports):
+    """Adds the reports to the expiry schedule,
+    the sorted set scored by the expire time."""
+    if reports:
+        get_redis().zadd(
+            settings.REPORT_EXPIRY_SCHEDULE_KEY,
+            {report.id: report.expire_time.timestamp() for report in reports}
+        )
+
+
+def unschedule_report_expiry(report_ids):
+    """Removes the reports from the expiry schedule."""
+    if report_ids:
+        get_redis().zrem(settings.REPORT_EXPIRY_SCHEDULE_KEY, *report_ids)
+
+
+def pop_due_report_ids(now, limit):
+    """Removes from the schedule and returns the ids of the reports
+    due by now. Every id is claimed by its own ZREM, so each report
+    is returned to only one of the concurrent workers."""
+    client = get_redis()
+    report_ids = client.zrangebyscore(
+        settings.REPORT_EXPIRY_SCHEDULE_KEY,
+        '-inf',
+        now.timestamp(),
+        start=0,
+        num=limit
+    )
+    if not report_ids:
+        return []
+    pipeline = client.pipeline(transaction=False)
+    for report_id in report_ids:
+        pipeline.zrem(settings.REPORT_EXPIRY_SCHEDULE_KEY, report_id)
+    return [
+        int(report_id)
+        for report_id, claimed in zip(report_ids, pipeline.execute())
+        if claimed
+    ]
@@ -0,0 +1,17 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.tasks import expire_due_reports
+
+
+class Command(BaseCommand):
+    help = 'Deletes the reports as soon as they expire by the schedule.'
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            if not expire_due_reports():
+                time.sleep(settings.REPORT_EXPIRY_POLL_INTERVAL)
@@ -0,0 +1,32 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+expired_reports_deleted = Counter(
+    'pastebin_expired_reports_deleted_total',
+    'Number of the expired reports deleted by the expiry job.'
+)
+report_expiry_lag = Gauge(
+    'pastebin_report_expiry_lag_seconds',
+    'How long the oldest expired report is still kept in the table.',
+    multiprocess_mode='max'
+)
+request_duration = Histogram(
+    'pastebin_request_duration_seconds',
+    'Total time of handling the request by the view.',
+    ['view', 'method']
+)
+request_db_queries = Histogram(
+    'pastebin_request_db_queries',
+    'Number of the database queries made by the request.',
+    ['view', 'method'],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50, float('inf'))
+)
+request_db_duration = Histogram(
+    'pastebin_request_db_duration_seconds',
+    'Total time of the database queries made by the request.',
+    ['view', 'method']
+)
+request_cache_events = Counter(
+    'pastebin_request_cache_events_total',
+    'Number of the cache hits and misses of the requests.',
+    ['view', 'method', 'event']
+)
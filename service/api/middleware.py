@@ -0,0 +1,116 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from api import metrics
+from api.cache import request_cache_stats
+
+request_query_stats = ContextVar('request_query_stats', default=None)
+
+
+class QueryStats:
+    """The execute wrapper counting the queries
+    of the request and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    """Counts the query in the stats of the current request, if any."""
+    query_stats = request_query_stats.get()
+    if query_stats is None:
+        return execute(sql, params, many, context)
+    return query_stats(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Adds the query recorder to the new database connection.
+
+    The connections are per thread and the sync views are run
+    in the thread of sync_to_async under the ASGI server, so
+    the recorder is kept on every connection and finds the stats
+    of the request by the context variable copied to that thread."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    """Records the latency, the number and time of the database
+    queries and the cache hits and misses of every request
+    in the Prometheus metrics labeled by the view.
+
+    The queries are counted by the execute wrapper of every
+    connection, so it works without DEBUG and keeps no SQL in memory.
+    The middleware is async under the ASGI server, so the async views
+    are not run in the thread."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.record_metrics(request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with self.record_metrics(request):
+            return await self.get_response(request)
+
+    @contextmanager
+    def record_metrics(self, request):
+        """Collects the stats of the request handled in the block."""
+        query_stats = QueryStats()
+        cache_stats = Counter()
+        query_token = request_query_stats.set(query_stats)
+        cache_token = request_cache_stats.set(cache_stats)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            request_cache_stats.reset(cache_token)
+            request_query_stats.reset(query_token)
+        duration = time.perf_counter() - start
+        labels = {
+            'view': self.get_view_name(request),
+            'method': request.method
+        }
+        metrics.request_duration.labels(**labels).observe(duration)
+        metrics.request_db_queries.labels(**labels).observe(
+            query_stats.count
+        )
+        metrics.request_db_duration.labels(**labels).observe(
+            query_stats.duration
+        )
+        for event, count in cache_stats.items():
+            metrics.request_cache_events.labels(
+                **labels,
+                event=event
+            ).inc(count)
+
+    @staticmethod
+    def get_view_name(request):
+        """Returns the name of the resolved view, the unresolved
+        requests share the same name to bound the number of labels."""
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is None:
+            return 'unresolved'
+        return resolver_match.view_name
@@ -1,55 +1,590 @@
+import json
+import random
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
 from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags
 from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
+from api.cache import (
+    bump_generation,
+    count_cache_event,
+    delete_cached,
+    get_cached,
+    get_etag,
+    get_generations,
+    get_gzip_etag,
+    get_obj_cache_name,
+    pack_body,
+    set_cached,
+    unpack_body
+)
+from api.pagination import SearchPagination
+from app.db_routers import is_pinned, pin_primary, use_replicas
+from posts.compression import GZIP, accepts_gzip
 
-class RetrieveCacheMixin(ModelViewSet):
-    """An mixin class with redefined retrieve
-     method for working with the cache."""
+
+def get_bool_param(request, name):
+    """Returns the value of the "true" or "false" query parameter,
+    or None if it is missing."""
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    if value not in ('true', 'false'):
+        raise ValidationError({name: 'Must be "true" or "false".'})
+    return value == 'true'
+
+
+def get_names_param(request, name):
+    """Returns the set of the comma-separated names of the query
+    parameter."""
+    return {
+        value.strip()
+        for value in request.query_params.get(name, '').split(',')
+        if value.strip()
+    }
+
+
+def is_conditional(request):
+    """Returns True if the request has the conditional headers."""
+    return (
+        'HTTP_IF_NONE_MATCH' in request.META
+        or 'HTTP_IF_MODIFIED_SINCE' in request.META
+    )
+
+
+def set_validator_headers(response, etag, last_modified):
+    """Sets the ETag and Last-Modified headers of the response."""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def get_validator_response(request, etag, last_modified, gzip=True):
+    """Returns the 304 response by the validators of the instance
+    if the client already has it, None otherwise. The client accepting
+    gzip is checked against the ETag of the gzipped representation
+    if it sends that one, the gzipped representation of the same
+    version is served only to the clients accepting it."""
+    if gzip and accepts_gzip(request):
+        gzip_etag = get_gzip_etag(etag)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        etags = {
+            value.removeprefix('W/') for value in parse_etags(if_none_match)
+        }
+        if gzip_etag in etags:
+            etag = gzip_etag
+    not_modified = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified
+    )
+    if not_modified is None:
+        return None
+    return set_validator_headers(not_modified, etag, last_modified)
+
+
+def get_cached_response(request, cache_entry, is_json=True):
+    """Returns the response with the cached body as is, or the
+    304 response if the client already has the same body.
+    The gzipped body is sent without decompressing to the
+    clients accepting it, under its own ETag."""
+    etag = cache_entry['etag']
+    last_modified = cache_entry['last_modified']
+    send_gzip = (
+        is_json
+        and cache_entry['encoding'] == GZIP
+        and accepts_gzip(request)
+    )
+    if send_gzip:
+        etag = get_gzip_etag(etag)
+    not_modified = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified
+    )
+    if not_modified is not None:
+        response = set_validator_headers(not_modified, etag, last_modified)
+    elif not is_json:
+        body = unpack_body(cache_entry)
+        return Response(json.loads(body), status=status.HTTP_200_OK)
+    elif send_gzip:
+        response = HttpResponse(
+            cache_entry['body'],
+            content_type='application/json'
+        )
+        response['Content-Encoding'] = GZIP
+        set_validator_headers(response, etag, last_modified)
+    else:
+        response = HttpResponse(
+            unpack_body(cache_entry),
+            content_type='application/json'
+        )
+        set_validator_headers(response, etag, last_modified)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+class BaseCacheMixin(ModelViewSet):
+    """An mixin class with the common methods for
+    building the cache names and the cached responses."""
 
     cache_base_name = None
+
+    def get_cache_scope(self):
+        """Returns the scope of the instance cache entries,
+        which is None if they are shared by all the users."""
+        return None
+
+    def get_lookup_value(self):
+        """Returns the value the instance is looked up by in the URL."""
+        return self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+
+    def get_obj_cache_name(self, lookup_value):
+        """Returns the cache name of the model instance,
+        which is addressed by the lookup value of the URL."""
+        return get_obj_cache_name(
+            self.cache_base_name,
+            lookup_value,
+            self.get_cache_scope()
+        )
+
+    def get_cached_response(self, request, cache_entry):
+        """Returns the response with the cached body as is, unless
+        the client asks for another format than JSON."""
+        return get_cached_response(
+            request,
+            cache_entry,
+            request.accepted_renderer.format == 'json'
+        )
+
+    def use_replicas(self, cache_names):
+        """Sends the reads of the block filling the cache entries
+        to the replicas, unless the request is unsafe or the user
+        or the entries were changed by a recent write."""
+        return use_replicas(
+            self.request.method == 'GET'
+            and not is_pinned([f'user/{self.request.user.id}', *cache_names])
+        )
+
+
+class GenerationCacheMixin(BaseCacheMixin):
+    """An mixin class with the generation counters
+    for invalidating the cached lists."""
+
+    def get_cache_generation_names(self):
+        """Returns the names of the generation counters
+        the cached list depends on."""
+        return [f'{self.cache_base_name}_generation']
+
+    def get_invalidated_generation_names(self):
+        """Returns the names of the generation counters
+        to bump when the model instance is changed."""
+        return self.get_cache_generation_names()
+
+    def invalidate_list_cache(self):
+        """Bumps all the generation counters affected by the change
+        and pins the user to the primary to read the own writes."""
+        for generation_name in self.get_invalidated_generation_names():
+            bump_generation(generation_name)
+        pin_primary([f'user/{self.request.user.id}'])
+
+
+class ListCacheMixin(GenerationCacheMixin):
+    """An mixin class with redefined list
+     method for working with the cache."""
+
+    cache_list_lifetime = None
+
+    def get_list_cache_name(self, request, generations=None):
+        """Returns the cache name of the requested page, which
+        contains the current values of the generation counters."""
+        generation_names = self.get_cache_generation_names()
+        if generations is None:
+            generations = get_generations(generation_names)
+        page_key = md5(
+            f'{generation_names}{generations}'
+            f'{request.build_absolute_uri()}'.encode()
+        ).hexdigest()
+        return f'{self.cache_base_name}_list_cache/{page_key}'
+
+    def get_list_cache_lifetime(self, list_data):
+        """Returns the lifetime of the cached page."""
+        return self.cache_list_lifetime
+
+    def list(self, request, *args, **kwargs):
+        """List the model instances, sets the cache with
+        the rendered JSON page, if there is none."""
+        list_cache_name = self.get_list_cache_name(request)
+        cache_entry = cache.get(list_cache_name)
+        if cache_entry is None:
+            count_cache_event('redis_misses')
+            with self.use_replicas(self.get_cache_generation_names()):
+                response = super().list(request, *args, **kwargs)
+            body = JSONRenderer().render(response.data)
+            cache_entry = {
+                **pack_body(body),
+                'etag': get_etag(body),
+                'last_modified': None
+            }
+            cache.set(
+                list_cache_name,
+                cache_entry,
+                self.get_list_cache_lifetime(response.data)
+            )
+        else:
+            count_cache_event('redis_hits')
+        return self.get_cached_response(request, cache_entry)
+
+
+class CreateCacheMixin(GenerationCacheMixin):
+    """An mixin class with redefined create
+     method for working with the cache."""
+
+    def create(self, request, *args, **kwargs):
+        """Create the model instance and invalidates the cached lists."""
+        response = super().create(request, *args, **kwargs)
+        self.invalidate_list_cache()
+        return response
+
+
+class BulkCreateMixin(GenerationCacheMixin):
+    """An mixin class with the bulk action creating the list
+    of the model instances by one request.
+
+    The items are validated in one pass with the related instances
+    loaded at once, the valid ones are saved by perform_bulk_create()
+    and the result of every item is returned in the order of the list."""
+
+    bulk_related_fields = {}
+
+    def get_bulk_related_querysets(self):
+        """Returns the querysets of the related instances by the names
+        of the fields referencing them."""
+        return self.bulk_related_fields
+
+    def get_bulk_instances(self, items):
+        """Returns the dict of the related instances by their pks
+        by the models, loaded by one query for each related field."""
+        bulk_instances = {}
+        querysets = self.get_bulk_related_querysets()
+        for field_name, queryset in querysets.items():
+            pks = set()
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                values = item.get(field_name)
+                if not isinstance(values, list):
+                    values = [values]
+                for value in values:
+                    try:
+                        pks.add(int(value))
+                    except (TypeError, ValueError):
+                        pass
+            bulk_instances[queryset.model] = queryset.in_bulk(pks)
+        return bulk_instances
+
+    def perform_bulk_create(self, serializers):
+        """Saves the instances of the valid serializers and sets them
+        as serializer.instance. They are saved one by one by
+        perform_create(), the views insert them at once instead."""
+        for serializer in serializers:
+            self.perform_create(serializer)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """Creates the model instances of the list, returns the
+        201 status if all of them are created, 207 otherwise."""
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError('Expected a list of items.')
+        if len(items) > settings.BULK_CREATE_MAX_SIZE:
+            raise ValidationError(
+                f'Expected at most {settings.BULK_CREATE_MAX_SIZE} items.'
+            )
+        context = {
+            **self.get_serializer_context(),
+            'bulk_instances': self.get_bulk_instances(items)
+        }
+        serializer_class = self.get_serializer_class()
+        serializers = [
+            serializer_class(data=item, context=context) for item in items
+        ]
+        valid_serializers = [
+            serializer for serializer in serializers if serializer.is_valid()
+        ]
+        if valid_serializers:
+            with transaction.atomic():
+                self.perform_bulk_create(valid_serializers)
+            self.invalidate_list_cache()
+        results = []
+        for serializer in serializers:
+            if serializer.instance is None:
+                results.append({
+                    'status': status.HTTP_400_BAD_REQUEST,
+                    'errors': serializer.errors
+                })
+            else:
+                results.append({
+                    'status': status.HTTP_201_CREATED,
+                    'data': serializer.data
+                })
+        if len(valid_serializers) == len(serializers):
+            return Response(results, status=status.HTTP_201_CREATED)
+        return Response(results, status=status.HTTP_207_MULTI_STATUS)
+
+
+class SearchMixin(ModelViewSet):
+    """An mixin class with the search action returning the
+    instances of the queryset matching the full-text query
+    of the "q" parameter, from the most relevant.
+
+    The query has the web search syntax, the results are
+    not cached as the queries are too diverse."""
+
+    search_vector_field = 'search_vector'
+
+    @action(detail=False, methods=['get'])
+    def search(self, request, *args, **kwargs):
+        """Returns the page of the ranked search results."""
+        query_text = request.query_params.get('q', '').strip()
+        if not query_text:
+            raise ValidationError({'q': 'This parameter is required.'})
+        query = SearchQuery(
+            query_text,
+            config=settings.SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        queryset = self.get_queryset().filter(
+            **{self.search_vector_field: query}
+        ).annotate(
+            search_rank=SearchRank(F(self.search_vector_field), query)
+        ).order_by('-search_rank', '-id')
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class SparseFieldsMixin(ModelViewSet):
+    """An mixin class rendering only the fields of the lists requested
+    by the "fields" parameter, or not excluded by the "omit" one, and
+    the compact_serializer_class by the "compact" parameter.
+
+    The fields of the nested serializers are named by their paths,
+    like "post.title". The lists load the .values() rows of only the
+    columns of the rendered fields, which are rendered by the row
+    serializers without the model instances."""
+
+    sparse_actions = ('list', 'search')
+    compact_serializer_class = None
+
+    def get_serializer_class(self):
+        """Returns the compact_serializer_class for the compact lists."""
+        if (
+            self.action in self.sparse_actions
+            and get_bool_param(self.request, 'compact')
+        ):
+            return self.compact_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        """Adds the requested and the omitted fields of the lists."""
+        context = super().get_serializer_context()
+        if self.action in self.sparse_actions:
+            for name in ('fields', 'omit'):
+                names = get_names_param(self.request, name)
+                self.check_field_paths(name, names, context)
+                context[name] = names
+        return context
+
+    def check_field_paths(self, name, names, context):
+        """Raises the ValidationError listing the valid paths if some
+        of the names of the parameter are not the paths of the fields."""
+        if not names:
+            return
+        paths = self.get_serializer_class()(
+            context=context
+        ).get_field_paths()
+        unknown = names.difference(paths)
+        if unknown:
+            raise ValidationError({name: (
+                f'Unknown fields: {", ".join(sorted(unknown))}. '
+                f'Valid fields: {", ".join(paths)}.'
+            )})
+
+    def get_sparse_queryset(self, queryset):
+        """Returns the .values() rows of the columns of the rendered
+        fields and of the ordering of the pagination."""
+        columns = self.get_serializer().get_columns()
+        columns += [
+            field.lstrip('-')
+            for field in getattr(self.paginator, 'ordering', ())
+        ]
+        return queryset.values(*dict.fromkeys(columns))
+
+
+class RetrieveCacheMixin(BaseCacheMixin):
+    """An mixin class with redefined retrieve
+     method for working with the cache.
+
+    The cache entry becomes stale after the jittered cache_obj_lifetime
+    and is served for CACHE_STALE_LIFETIME more while a single worker,
+    holding the lock, refreshes it.
+
+    A conditional request is answered with 304 from the cache entry
+    or, when it is missing, from the validators of the instance
+    loaded by the narrow get_validator_queryset()."""
+
     cache_obj_lifetime = None
 
-    def retrieve(self, request, *args, **kwargs):
-        """Retrieve the model instance, sets the cache with
-        the serializer data value, if there is none."""
-        obj_cache_name = f'{self.cache_base_name}_cache/{kwargs["pk"]}'
-        obj_data = cache.get(obj_cache_name)
-        if obj_data is None:
+    def get_cache_lifetime(self, instance):
+        """Returns the jittered lifetime of the instance cache entry,
+        so that the entries created together expire at different times."""
+        jitter = random.uniform(1 - settings.CACHE_JITTER, 1)
+        return int(self.cache_obj_lifetime * jitter)
+
+    def get_cache_max_lifetime(self, instance):
+        """Returns the number of seconds the instance cache entry,
+        including the stale one, may live, or None if not limited."""
+        return None
+
+    def get_validator_queryset(self):
+        """Returns the queryset loading only the fields needed
+        by get_validators(), or None if there are no validators."""
+        return None
+
+    def get_validators(self, instance):
+        """Returns the strong ETag and the last modification
+        timestamp of the instance, or None instead of each."""
+        return None, None
+
+    def get_not_modified_response(self, request, lookup_value):
+        """Returns the 304 response if the client already has
+        the current version of the instance, None otherwise."""
+        queryset = self.get_validator_queryset()
+        if queryset is None:
+            return None
+        with self.use_replicas([self.get_obj_cache_name(lookup_value)]):
+            instance = get_object_or_404(
+                queryset,
+                **{self.lookup_field: lookup_value}
+            )
+        self.check_object_permissions(request, instance)
+        etag, last_modified = self.get_validators(instance)
+        return get_validator_response(request, etag, last_modified)
+
+    def set_cache_entry(self, obj_cache_name):
+        """Serializes the model instance and sets the cache
+        entry with the rendered JSON body."""
+        with self.use_replicas([obj_cache_name]):
             instance = self.get_object()
             serializer = self.get_serializer(instance)
-            obj_data = serializer.data
-            cache.set(obj_cache_name, obj_data, self.cache_obj_lifetime)
-        return Response(obj_data, status=status.HTTP_200_OK)
+            body = JSONRenderer().render(serializer.data)
+        lifetime = self.get_cache_lifetime(instance)
+        timeout = lifetime + settings.CACHE_STALE_LIFETIME
+        max_lifetime = self.get_cache_max_lifetime(instance)
+        if max_lifetime is not None:
+            lifetime = min(lifetime, max_lifetime)
+            timeout = min(timeout, max_lifetime)
+        etag, last_modified = self.get_validators(instance)
+        cache_entry = {
+            **pack_body(body),
+            'etag': etag or get_etag(body),
+            'last_modified': last_modified,
+            'stale_at': time.time() + lifetime
+        }
+        set_cached(obj_cache_name, cache_entry, timeout)
+        return cache_entry
+
+    def refresh_cache_entry(self, obj_cache_name, cache_entry):
+        """Refreshes the missing or stale cache entry by only one worker,
+        the others serve the stale entry or wait for the fresh one."""
+        lock_name = f'{obj_cache_name}/lock'
+        if cache.add(lock_name, 1, settings.CACHE_LOCK_TIMEOUT):
+            try:
+                return self.set_cache_entry(obj_cache_name)
+            except Http404:
+                delete_cached([obj_cache_name])
+                raise
+            finally:
+                cache.delete(lock_name)
+        if cache_entry is not None:
+            return cache_entry
+        wait_until = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+        while time.monotonic() < wait_until:
+            time.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+            cache_entry = cache.get(obj_cache_name)
+            if cache_entry is not None:
+                return cache_entry
+        return self.set_cache_entry(obj_cache_name)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve the model instance, sets the cache with the
+        rendered JSON body, if there is none or it is stale.
+        The cached body is returned as is, unless the client
+        asks for another format than JSON."""
+        lookup_value = self.get_lookup_value()
+        obj_cache_name = self.get_obj_cache_name(lookup_value)
+        cache_entry = get_cached(obj_cache_name)
+        if cache_entry is None or cache_entry['stale_at'] <= time.time():
+            if is_conditional(request):
+                not_modified = self.get_not_modified_response(
+                    request,
+                    lookup_value
+                )
+                if not_modified is not None:
+                    return not_modified
+            cache_entry = self.refresh_cache_entry(obj_cache_name, cache_entry)
+        return self.get_cached_response(request, cache_entry)
 
 
-class PatchCacheMixin(ModelViewSet):
+class PatchCacheMixin(GenerationCacheMixin):
     """An mixin class with redefined partial_update
      method for working with the cache."""
 
-    cache_base_name = None
-
     def partial_update(self, request, *args, **kwargs):
         """Partial update the model instance and invalidates the cache."""
-        obj_cache_name = f'{self.cache_base_name}_cache/{kwargs["pk"]}'
-        cache.delete(obj_cache_name)
-        return super().partial_update(request, *args, **kwargs)
+        obj_cache_name = self.get_obj_cache_name(self.get_lookup_value())
+        delete_cached([obj_cache_name])
+        response = super().partial_update(request, *args, **kwargs)
+        self.invalidate_list_cache()
+        return response
 
 
-class DestroyCacheMixin(ModelViewSet):
+class DestroyCacheMixin(GenerationCacheMixin):
     """An mixin class with redefined destroy
      method for working with the cache."""
 
-    cache_base_name = None
-
     def destroy(self, request, *args, **kwargs):
         """Destroy  the model instance and invalidates the cache."""
-        obj_cache_name = f'{self.cache_base_name}_cache/{kwargs["pk"]}'
-        cache.delete(obj_cache_name)
-        return super().destroy(request, *args, **kwargs)
+        obj_cache_name = self.get_obj_cache_name(self.get_lookup_value())
+        delete_cached([obj_cache_name])
+        response = super().destroy(request, *args, **kwargs)
+        self.invalidate_list_cache()
+        return response
 
 
-class CacheMixin(RetrieveCacheMixin, PatchCacheMixin, DestroyCacheMixin):
+class CacheMixin(
+    ListCacheMixin,
+    CreateCacheMixin,
+    RetrieveCacheMixin,
+    PatchCacheMixin,
+    DestroyCacheMixin
+):
     """An mixin class with redefined
     methods for working with the cache."""
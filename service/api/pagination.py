@@ -0,0 +1,44 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    """Cursor pagination with an opaque cursor and bounded page size."""
+
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class PostCursorPagination(BaseCursorPagination):
+    """Paginates the posts from newest to oldest by (created_at, id)."""
+
+    ordering = ('-created_at', '-id')
+
+
+class ReportCursorPagination(BaseCursorPagination):
+    """Paginates the reports from the soonest to expire
+    to the latest by (expire_time, id)."""
+
+    ordering = ('expire_time', 'id')
+
+
+class TagCursorPagination(BaseCursorPagination):
+    """Paginates the tags by their unique names."""
+
+    ordering = ('name',)
+
+
+class ReportTagCursorPagination(BaseCursorPagination):
+    """Paginates the tag index rows of the reports in the same
+    order as the reports, by (expire_time, report_id)."""
+
+    ordering = ('expire_time', 'report_id')
+
+
+class SearchPagination(LimitOffsetPagination):
+    """Paginates the search results ranked by their relevance,
+    which is not a stable key for the cursor."""
+
+    default_limit = settings.PAGE_SIZE
+    max_limit = settings.MAX_PAGE_SIZE
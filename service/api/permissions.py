@@ -10,7 +10,7 @@ class IsAuthor(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         """The request user and the obj.author are the same person."""
-        return request.user == obj.author
+        return request.user.id == obj.author_id
 
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
@@ -24,4 +24,7 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         """The request user and the obj.author are the same
         person or GET request."""
-        return request.user == obj.post.author or request.method == 'GET'
+        return (
+            request.method == 'GET'
+            or request.user.id == obj.post.author_id
+        )
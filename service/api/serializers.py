@@ -5,10 +5,185 @@ from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from api.cache import tag_cache
+from api.expiry import schedule_report_expiry
 from posts import models
+from posts.blobs import get_blob_store
+from posts.compression import decompress
 
 
-class UserSerializer(UserCreateSerializer):
+def is_requested(path, requested):
+    """Returns True if the field of the path, or the nested serializer
+    containing it, or some of its nested fields are requested."""
+    names = path.split('.')
+    return any(
+        '.'.join(names[:length]) in requested
+        for length in range(1, len(names) + 1)
+    ) or any(name.startswith(f'{path}.') for name in requested)
+
+
+class SparseFieldsSerializerMixin:
+    """Leaves out the fields not requested by the "fields" set of the
+    context or requested by the "omit" one, the fields of the nested
+    serializers are named by their paths, like "post.title". The
+    unknown names are rejected by the view."""
+
+    field_columns = {}
+
+    def get_field_path(self, field_name):
+        """Returns the path of the field from the root serializer."""
+        names = [field_name]
+        parent = self
+        while parent is not None:
+            if parent.field_name:
+                names.append(parent.field_name)
+            parent = parent.parent
+        return '.'.join(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        omitted = self.context.get('omit')
+        for field_name in list(fields):
+            path = self.get_field_path(field_name)
+            if (
+                (requested and not is_requested(path, requested))
+                or (omitted and path in omitted)
+            ):
+                del fields[field_name]
+        return fields
+
+    def get_field_paths(self, prefix=''):
+        """Returns the paths of the rendered fields and of the fields
+        of the nested serializers."""
+        paths = []
+        for field_name, field in self.fields.items():
+            if field.write_only:
+                continue
+            path = f'{prefix}{field_name}'
+            paths.append(path)
+            if isinstance(field, SparseFieldsSerializerMixin):
+                paths += field.get_field_paths(f'{path}.')
+        return paths
+
+    def get_columns(self, prefix=''):
+        """Returns the model columns of the rendered fields, with the
+        relations of the nested serializers, so that only them are
+        loaded by the query."""
+        columns = []
+        for field_name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, SparseFieldsSerializerMixin):
+                relation = f'{prefix}{field.source}'
+                columns += [relation, *field.get_columns(f'{relation}__')]
+            else:
+                columns += [
+                    f'{prefix}{column}'
+                    for column in self.field_columns.get(
+                        field_name,
+                        (field.source,)
+                    )
+                ]
+        return columns
+
+
+class RowSerializer:
+    """The read-only serializer of the .values() rows compiled from
+    the rendered fields of the model serializer, it renders the same
+    representation without the field machinery of DRF. The row has
+    the columns of get_columns() of the serializer.
+
+    The values are converted by the to_representation() of the fields,
+    the nested serializers are flattened into the getters of their
+    columns and the texts are loaded from the blob store at once."""
+
+    def __init__(self, serializer):
+        self.text_columns = []
+        self.getters = self.compile(serializer)
+
+    def compile(self, serializer, prefix=''):
+        """Returns the (name, getter) pairs of the rendered fields,
+        the getter takes the row and the texts by their digests."""
+        getters = []
+        for field_name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            columns = [
+                f'{prefix}{column}'
+                for column in serializer.field_columns.get(
+                    field_name,
+                    (field.source,)
+                )
+            ]
+            getters.append(
+                (field_name, self.compile_field(field, columns, prefix))
+            )
+        return getters
+
+    def compile_field(self, field, columns, prefix):
+        column = columns[0]
+        if isinstance(field, SparseFieldsSerializerMixin):
+            relation = f'{prefix}{field.source}'
+            return self.get_nested_getter(
+                relation,
+                self.compile(field, f'{relation}__')
+            )
+        if isinstance(field, BlobTextField):
+            self.text_columns.append(column)
+            return lambda row, texts: texts.get(row[column])
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(field.parent, f'{field.method_name}_from_row')
+            return lambda row, texts: method(
+                *[row[column] for column in columns]
+            )
+        if (
+            isinstance(field, serializers.DateTimeField)
+            and not hasattr(field, 'timezone')
+        ):
+            # The current timezone is looked up once for all the rows.
+            field.timezone = field.default_timezone()
+        to_representation = field.to_representation
+        if isinstance(field, CachedTagsField):
+            return lambda row, texts: to_representation(row[column])
+        return lambda row, texts: (
+            None if row[column] is None else to_representation(row[column])
+        )
+
+    @staticmethod
+    def get_nested_getter(relation, getters):
+        def get_nested(row, texts):
+            if row[relation] is None:
+                return None
+            return {name: getter(row, texts) for name, getter in getters}
+
+        return get_nested
+
+    def get_texts(self, rows):
+        """Returns the texts of the rows by their digests,
+        each text is decompressed once."""
+        digests = {
+            row[column]
+            for row in rows
+            for column in self.text_columns
+            if row[column]
+        }
+        if not digests:
+            return {}
+        return {
+            digest: decompress(*blob).decode()
+            for digest, blob in get_blob_store().get_many(digests).items()
+        }
+
+    def to_representation(self, rows):
+        texts = self.get_texts(rows)
+        return [
+            {name: getter(row, texts) for name, getter in self.getters}
+            for row in rows
+        ]
+
+
+class UserSerializer(SparseFieldsSerializerMixin, UserCreateSerializer):
     """Serializer for the user."""
 
     email = serializers.EmailField(required=True)
@@ -19,26 +194,156 @@ class UserSerializer(UserCreateSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
 
-class PostSerializer(serializers.ModelSerializer):
+class UserCompactSerializer(
+    SparseFieldsSerializerMixin,
+    serializers.ModelSerializer
+):
+    """Serializer for the author in the compact lists."""
+
+    class Meta:
+        fields = ('id', 'username')
+        model = models.User
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Related field taking the instances from the "bulk_instances"
+    context, loaded at once for all the items of the bulk request,
+    instead of querying each of them."""
+
+    def to_internal_value(self, data):
+        bulk_instances = self.context.get('bulk_instances')
+        if bulk_instances is None:
+            return super().to_internal_value(data)
+        try:
+            instance = bulk_instances[self.queryset.model].get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+class CachedTagsField(serializers.ManyRelatedField):
+    """The tags of the post rendered from its tag_ids by the
+    process-wide tag cache, without the query of the tags. The ids
+    are ordered by the names of the tags, the deleted tags are
+    left out and the tags missing in the cache are loaded."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('child_relation', BulkPrimaryKeyRelatedField(
+            queryset=models.Tag.objects.all()
+        ))
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return instance.tag_ids
+
+    def to_representation(self, tag_ids):
+        tags = tag_cache.get_tags(tag_ids)
+        return [
+            tag.id for tag in sorted(
+                (tags[tag_id] for tag_id in tag_ids if tag_id in tags),
+                key=lambda tag: tag.name
+            )
+        ]
+
+
+class BlobTextField(serializers.CharField):
+    """The text of the post kept in the blob store, which
+    is rendered by the row serializer from its digest."""
+
+
+class RowListSerializer(serializers.ListSerializer):
+    """Serializer for the list rendering the .values() rows of the
+    read-only lists by the RowSerializer compiled from the child."""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        if items and isinstance(items[0], dict):
+            return RowSerializer(self.child).to_representation(items)
+        return self.to_instance_representation(items)
+
+    def to_instance_representation(self, instances):
+        return super().to_representation(instances)
+
+
+class PostListSerializer(RowListSerializer):
+    """Serializer for the list of posts loading their
+    texts from the blob store at once, if they are rendered."""
+
+    def to_instance_representation(self, posts):
+        if 'text' in self.child.fields:
+            models.Post.prefetch_texts(posts)
+        return super().to_instance_representation(posts)
+
+
+class ReportListSerializer(RowListSerializer):
+    """Serializer for the list of reports loading the texts
+    of their posts from the blob store at once, if they are
+    rendered."""
+
+    def to_instance_representation(self, reports):
+        post_fields = getattr(self.child.fields.get('post'), 'fields', {})
+        if 'text' in post_fields:
+            models.Post.prefetch_texts([report.post for report in reports])
+        return super().to_instance_representation(reports)
+
+
+class PostSerializer(
+    SparseFieldsSerializerMixin,
+    serializers.ModelSerializer
+):
     """Serializer for the post."""
 
+    text = BlobTextField()
     created_at = serializers.DateTimeField(read_only=True)
     author = UserSerializer(read_only=True)
     is_public = serializers.SerializerMethodField(read_only=True)
+    tags = CachedTagsField(allow_empty=False)
+
+    field_columns = {
+        'text': ('text_digest',),
+        'tags': ('tag_ids',),
+        'is_public': ('public_until',)
+    }
 
     def get_is_public(self, instance):
         """Returns False if the "request" key is not in
         self.context or POST request, otherwise it returns
-        the annotated instance.is_public field."""
+        the instance.is_public property."""
+        return self.get_is_public_from_row(instance.public_until)
+
+    def get_is_public_from_row(self, public_until):
+        """The get_is_public() of the row serializer, which
+        takes the public_until column of the row."""
         context = self.context.get('request')
         if context is None:
             return False
         if self.context['request'].method == 'POST':
             return False
-        return instance.is_public
+        return public_until is not None and public_until >= timezone.now()
+
+    def create(self, validated_data):
+        """Creates the post and counts it in its tags."""
+        tags = validated_data.pop('tags', [])
+        validated_data['tag_ids'] = sorted({tag.id for tag in tags})
+        post = super().create(validated_data)
+        post.set_tags(tags, created=True)
+        return post
+
+    def update(self, instance, validated_data):
+        """Updates the post and its tags with their counts."""
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            validated_data['tag_ids'] = sorted({tag.id for tag in tags})
+        post = super().update(instance, validated_data)
+        if tags is not None:
+            post.set_tags(tags)
+        return post
 
     class Meta:
         model = models.Post
+        list_serializer_class = PostListSerializer
         fields = (
             'id',
             'title',
@@ -50,18 +355,49 @@ class PostSerializer(serializers.ModelSerializer):
         )
 
 
+class PostCompactSerializer(PostSerializer):
+    """Serializer for the post in the compact lists, with the
+    preview of the text and the compact author."""
+
+    author = UserCompactSerializer(read_only=True)
+
+    class Meta(PostSerializer.Meta):
+        fields = (
+            'id',
+            'title',
+            'text_preview',
+            'created_at',
+            'author',
+            'tags',
+            'is_public'
+        )
+
+
 class ReportCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating a report."""
 
+    serializer_related_field = BulkPrimaryKeyRelatedField
+
     class Meta:
         model = models.Report
-        fields = ('id', 'post', 'expire_time')
+        fields = ('id', 'slug', 'post', 'expire_time')
+
+    def get_fields(self):
+        """Restricts the post lookup to the posts of the request user,
+        loading only the ownership of the post."""
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is not None:
+            fields['post'].queryset = models.Post.objects.filter(
+                author_id=request.user.id
+            ).only('id', 'author')
+        return fields
 
     def validate_post(self, post):
         """Checks that the author of the report and
         the author of the post are the same person.
         """
-        if post.author != self.context['request'].user:
+        if post.author_id != self.context['request'].user.id:
             raise ValidationError(
                 'You cannot create a report with a post by another author!'
             )
@@ -75,19 +411,62 @@ class ReportCreateSerializer(serializers.ModelSerializer):
             )
         return value
 
+    def create(self, validated_data):
+        """Creates the report, schedules its expiry
+        and indexes it by the tags of its post."""
+        report = super().create(validated_data)
+        schedule_report_expiry([report])
+        models.ReportTag.objects.index_reports([report.id], created=True)
+        return report
+
+    def update(self, instance, validated_data):
+        """Updates the report, reschedules its expiry
+        and reindexes it by the tags of its post."""
+        report = super().update(instance, validated_data)
+        schedule_report_expiry([report])
+        models.ReportTag.objects.index_reports([report.id])
+        return report
 
-class PostViewSerializer(serializers.ModelSerializer):
+
+class PostViewSerializer(
+    SparseFieldsSerializerMixin,
+    serializers.ModelSerializer
+):
     """Serializer for the post without annotated field is_public."""
 
+    text = BlobTextField(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
     author = UserSerializer(read_only=True)
+    tags = CachedTagsField(read_only=True)
+
+    field_columns = PostSerializer.field_columns
 
     class Meta:
         model = models.Post
+        list_serializer_class = PostListSerializer
         fields = ('id', 'title', 'text', 'created_at', 'author', 'tags')
 
 
-class ReportViewSerializer(serializers.ModelSerializer):
+class PostViewCompactSerializer(PostViewSerializer):
+    """Serializer for the post of the report in the compact lists."""
+
+    author = UserCompactSerializer(read_only=True)
+
+    class Meta(PostViewSerializer.Meta):
+        fields = (
+            'id',
+            'title',
+            'text_preview',
+            'created_at',
+            'author',
+            'tags'
+        )
+
+
+class ReportViewSerializer(
+    SparseFieldsSerializerMixin,
+    serializers.ModelSerializer
+):
     """The serializer with an attachment PostViewSerializer
     for the presentation of the report."""
 
@@ -95,4 +474,20 @@ class ReportViewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = models.Report
-        fields = ('id', 'post', 'expire_time')
+        list_serializer_class = ReportListSerializer
+        fields = ('id', 'slug', 'post', 'expire_time')
+
+
+class ReportCompactSerializer(ReportViewSerializer):
+    """Serializer for the report in the compact lists."""
+
+    post = PostViewCompactSerializer()
+
+
+class TagSerializer(serializers.ModelSerializer):
+    """Serializer for the tag with the counts of its
+    posts and public reports."""
+
+    class Meta:
+        model = models.Tag
+        fields = ('id', 'name', 'description', 'post_count', 'report_count')
@@ -0,0 +1,96 @@
+import gzip
+import re
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from rest_framework.renderers import BaseRenderer
+
+from posts.compression import GZIP
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class PlainTextRenderer(BaseRenderer):
+    """Renderer accepting the text/plain clients of the raw text,
+    which is streamed by the view itself, and the error details."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'detail' in data:
+            return str(data['detail']).encode(self.charset)
+        return str(data).encode(self.charset)
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range starts beyond the end of the body."""
+
+
+def parse_range(range_header, size):
+    """Returns the (start, end) inclusive offsets of the single byte
+    range of the Range header, or None if the whole body is to be sent.
+    The header is ignored if it is malformed or has many ranges."""
+    match = RANGE_RE.match(range_header.replace(' ', ''))
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        suffix_length = int(end)
+        if suffix_length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - suffix_length), size - 1
+    start = int(start)
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = int(end) if end else size - 1
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def iter_chunks(encoding, raw_file, start, length, chunk_size):
+    """Yields length bytes of the data from the start offset by chunks
+    and closes the file, the gzipped data is decompressed on the fly."""
+    with raw_file:
+        file = raw_file
+        if encoding == GZIP:
+            file = gzip.GzipFile(fileobj=raw_file, mode='rb')
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def aiter_chunks(encoding, raw_file, start, length, chunk_size):
+    """The async version of iter_chunks(), the chunks are read in the
+    thread pool, so the slow clients do not hold the worker."""
+    chunks = iter_chunks(encoding, raw_file, start, length, chunk_size)
+    read_chunk = sync_to_async(next, thread_sensitive=False)
+    try:
+        while True:
+            chunk = await read_chunk(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        chunks.close()
+
+
+def stream_chunks(request, *args):
+    """Returns the async iterator of the chunks under the ASGI
+    server and the sync one under the WSGI server.
+
+    The database connections of the ASGI request thread are closed
+    before streaming, as they are never reused by another request,
+    so that the slow clients do not hold them for the download."""
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        connections.close_all()
+        return aiter_chunks(*args)
+    return iter_chunks(*args)
@@ -1,25 +1,171 @@
+import logging
+import time
+from collections import defaultdict
+
 from celery import shared_task
 from celery.schedules import crontab
 
+from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from api import metrics
+from api.cache import bump_generation, delete_obj_caches
+from api.expiry import pop_due_report_ids, schedule_report_expiry
 from celery_app import app
 from posts import models
+from posts.blobs import get_blob_store
+
+logger = logging.getLogger(__name__)
 
 
 @app.on_after_finalize.connect
 def setup_periodic_tasks(sender, **kwargs):
     sender.add_periodic_task(
-        crontab(hour=17, minute=25),
+        settings.REPORT_EXPIRY_INTERVAL,
         delete_expired_reports.s(),
         name='delete_expired_reports'
     )
+    sender.add_periodic_task(
+        crontab(hour=4, minute=0),
+        delete_orphan_blobs.s(),
+        name='delete_orphan_blobs'
+    )
+    sender.add_periodic_task(
+        crontab(hour=4, minute=30),
+        recount_tags.s(),
+        name='recount_tags'
+    )
+
+
+def delete_reports(report_rows):
+    """Delete the reports of the (id, slug, post_id, author_id) rows
+    and their tag index, drop the cache entries, touch the posts."""
+    models.ReportTag.objects.unindex_reports(
+        [report_id for report_id, _, _, _ in report_rows]
+    )
+    models.Report.objects.filter(
+        id__in=[report_id for report_id, _, _, _ in report_rows]
+    ).delete()
+    delete_obj_caches('report', [slug for _, slug, _, _ in report_rows])
+    models.Post.objects.filter(
+        id__in={post_id for _, _, post_id, _ in report_rows}
+    ).touch()
+    bump_generation('report_generation')
+    author_post_ids = defaultdict(list)
+    for _, _, post_id, author_id in report_rows:
+        author_post_ids[author_id].append(post_id)
+    for author_id, post_ids in author_post_ids.items():
+        delete_obj_caches('post', post_ids, author_id)
+        bump_generation(f'post_generation/{author_id}')
+
+
+def get_expiry_lag(now):
+    """Returns the number of seconds the oldest
+    expired report is still kept in the table."""
+    oldest_expire_time = models.Report.objects.filter(
+        expire_time__lt=now
+    ).order_by('expire_time').values_list('expire_time', flat=True).first()
+    if oldest_expire_time is None:
+        return 0
+    return (now - oldest_expire_time).total_seconds()
+
+
+def expire_due_reports():
+    """Delete the reports due by the expiry schedule and returns the
+    number of the claimed ones. The reports prolonged since they were
+    scheduled, or failed to be deleted, are put back to the schedule."""
+    now = timezone.now()
+    report_ids = pop_due_report_ids(now, settings.REPORT_EXPIRY_BATCH_SIZE)
+    if not report_ids:
+        return 0
+    reports = list(
+        models.Report.objects.filter(id__in=report_ids).only(
+            'id', 'slug', 'post_id', 'expire_time', 'post__author_id'
+        ).select_related('post')
+    )
+    expired_rows = [
+        (report.id, report.slug, report.post_id, report.post.author_id)
+        for report in reports
+        if report.expire_time <= now
+    ]
+    try:
+        if expired_rows:
+            delete_reports(expired_rows)
+    except Exception:
+        schedule_report_expiry(reports)
+        raise
+    schedule_report_expiry(
+        [report for report in reports if report.expire_time > now]
+    )
+    metrics.expired_reports_deleted.inc(len(expired_rows))
+    return len(report_ids)
 
 
 @shared_task
 def delete_expired_reports():
-    """Delete all reports where the expire
-    time is less than the current one."""
-    now = timezone.now()
-    expired_posts = models.Report.objects.filter(expire_time__lt=now)
-    expired_posts.delete()
+    """Delete the reports where the expire time is less than the
+    current one by batches in the order of the expire_time index,
+    until none are left or the time budget of the run is spent.
+    The reports are deleted on time by the expire_reports command,
+    so this task only reconciles the ones missed by the schedule."""
+    deadline = time.monotonic() + settings.REPORT_EXPIRY_TIME_BUDGET
+    batch_size = settings.REPORT_EXPIRY_BATCH_SIZE
+    deleted = 0
+    while time.monotonic() < deadline:
+        now = timezone.now()
+        expired_rows = list(
+            models.Report.objects.filter(
+                expire_time__lt=now
+            ).order_by('expire_time', 'id').values_list(
+                'id',
+                'slug',
+                'post_id',
+                'post__author_id'
+            )[:batch_size]
+        )
+        if expired_rows:
+            delete_reports(expired_rows)
+            deleted += len(expired_rows)
+        if len(expired_rows) < batch_size:
+            break
+    lag = get_expiry_lag(timezone.now())
+    metrics.expired_reports_deleted.inc(deleted)
+    metrics.report_expiry_lag.set(lag)
+    logger.info('Deleted %s expired reports, lag %.1fs', deleted, lag)
+    return {'deleted': deleted, 'lag': lag}
+
+
+@shared_task
+def delete_orphan_blobs():
+    """Delete the blobs no longer used by any post."""
+    return get_blob_store().delete_orphans(
+        models.Post.objects.values('text_digest'),
+        settings.BLOB_GC_GRACE_PERIOD
+    )
+
+
+@shared_task
+def recount_tags():
+    """Recount the posts and the reports of the tags, the counters
+    are updated by the deltas and may drift on the deletions
+    bypassing the views, like the deletion of the user."""
+    PostTag = models.Post.tags.through
+
+    def count(model):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(
+                    tag_id=OuterRef('id')
+                ).order_by().values('tag_id').annotate(
+                    count=Count('id')
+                ).values('count')
+            ),
+            0
+        )
+
+    return models.Tag.objects.update(
+        post_count=count(PostTag),
+        report_count=count(models.ReportTag)
+    )
@@ -1,12 +1,23 @@
+import gzip
 from datetime import timedelta
+from unittest import mock
 
+from django.conf import settings
 from django.shortcuts import reverse
 from django.core.cache import cache
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIRequestFactory
 from rest_framework.test import APITestCase, APIClient
 
-from api import serializers
+from api import serializers, views
+from api.cache import (
+    get_cached,
+    get_obj_cache_name,
+    get_redis,
+    tag_cache
+)
+from api.mixins import BulkCreateMixin
 from api.tests import utils as td
 from posts import models
 
@@ -22,10 +33,11 @@ class PostApiTestCase(APITestCase):
         cls.post1 = models.Post.objects.create(**post1_data)
         tag1_data = td.create_tag_data('mixin1')
         cls.tag1 = models.Tag.objects.create(**tag1_data)
-        cls.post1.tags.set([cls.tag1])
+        cls.post1.set_tags([cls.tag1])
 
     def setUp(self):
         cache.clear()
+        tag_cache.get_tags()
         self.auth_client = APIClient()
         self.auth_client.force_authenticate(self.user1)
 
@@ -39,14 +51,61 @@ class PostApiTestCase(APITestCase):
             many=True,
             context=context
         )
-        is_public = response.data[0].pop('is_public')
+        response_data = response.json()
+        is_public = response_data['results'][0].pop('is_public')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response_data['results'], serializer.data)
         self.assertEqual(
             models.Report.objects.filter(post=self.post1.id).exists(),
             is_public
         )
 
+    def test_list_posts_is_paginated_by_cursor(self):
+        """The list of posts is split into pages from newest
+        to oldest, and the next page is reached by the cursor."""
+        posts = [
+            models.Post.objects.create(
+                **td.create_post_data(f'page{i}', self.user1)
+            )
+            for i in range(3)
+        ]
+        url = reverse('api:post-list')
+        response = self.auth_client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [post['id'] for post in response.json()['results']],
+            [posts[2].id, posts[1].id]
+        )
+        next_response = self.auth_client.get(response.json()['next'])
+        self.assertEqual(
+            [post['id'] for post in next_response.json()['results']],
+            [posts[0].id, self.post1.id]
+        )
+        self.assertIsNone(next_response.json()['next'])
+
+    def test_list_posts_is_cached(self):
+        """The repeated request of the list of posts is served
+        from the cache without queries to the database."""
+        url = reverse('api:post-list')
+        response = self.auth_client.get(url)
+        with self.assertNumQueries(0):
+            cached_response = self.auth_client.get(url)
+        self.assertEqual(cached_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_response.content, response.content)
+
+    def test_created_post_invalidates_cached_list(self):
+        """The created post appears in the cached list of posts."""
+        url = reverse('api:post-list')
+        self.auth_client.get(url)
+        post_data = td.create_post_data('test1', self.user1)
+        post_data.update({'tags': [self.tag1.id]})
+        response = self.auth_client.post(url, data=post_data)
+        list_response = self.auth_client.get(url)
+        self.assertEqual(
+            list_response.json()['results'][0]['id'],
+            response.data['id']
+        )
+
     def test_user_can_create_post(self):
         """Authenticated user can create a posts."""
         posts_cnt = models.Post.objects.count()
@@ -66,14 +125,64 @@ class PostApiTestCase(APITestCase):
             self.post1,
             context=context
         )
-        is_public = response.data.pop('is_public')
+        response_data = response.json()
+        is_public = response_data.pop('is_public')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response_data, serializer.data)
         self.assertEqual(
             models.Report.objects.filter(post=self.post1.id).exists(),
             is_public
         )
 
+    def test_retrieve_post_not_modified(self):
+        """The post is not sent again to the client with the
+        current ETag, even if the post is not in the cache."""
+        url = reverse('api:post-detail', args=(self.post1.id,))
+        etag = self.auth_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            cached_response = self.auth_client.get(
+                url,
+                HTTP_IF_NONE_MATCH=etag
+            )
+        cache.clear()
+        response = self.auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(
+            cached_response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_changed_post_is_modified(self):
+        """The post is sent again after it has been changed
+        or shared by a report."""
+        post = models.Post.objects.create(
+            **td.create_post_data('test1', self.user1)
+        )
+        url = reverse('api:post-detail', args=(post.id,))
+        etag = self.auth_client.get(url)['ETag']
+        self.auth_client.patch(url, data={'title': 'Changed title'})
+        patched_response = self.auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        report_data = td.create_report_data(post.id)
+        report_data['expire_time'] += timedelta(days=1)
+        self.auth_client.post(reverse('api:report-list'), data=report_data)
+        shared_response = self.auth_client.get(
+            url,
+            HTTP_IF_NONE_MATCH=patched_response['ETag']
+        )
+        self.assertEqual(patched_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(shared_response.status_code, status.HTTP_200_OK)
+        self.assertTrue(shared_response.json()['is_public'])
+
+    def test_list_posts_not_modified(self):
+        """The page of posts is not sent again to
+        the client with the current ETag."""
+        url = reverse('api:post-list')
+        etag = self.auth_client.get(url)['ETag']
+        cache.clear()
+        response = self.auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
     def test_user_can_patch_post(self):
         """Authenticated user can patch the posts."""
         post_data = td.create_post_data('test1', self.user1)
@@ -88,6 +197,32 @@ class PostApiTestCase(APITestCase):
             changed_title
         )
 
+    def test_saved_post_keeps_report_fields(self):
+        """The save of the post loaded before its report was created
+        keeps the active reports counted by the touch."""
+        post = models.Post.objects.get(id=self.post1.id)
+        models.Report.objects.create(**td.create_report_data(self.post1))
+        models.Post.objects.filter(id=self.post1.id).touch()
+        post.title = 'Changed title'
+        post.save()
+        post = models.Post.objects.get(id=self.post1.id)
+        self.assertEqual(post.title, 'Changed title')
+        self.assertEqual(post.active_report_count, 1)
+        self.assertTrue(post.is_public)
+
+    def test_saved_post_version_follows_touch(self):
+        """The save of the post loaded before the touch gets the next
+        version after the touch, and not the same one."""
+        post = models.Post.objects.get(id=self.post1.id)
+        models.Post.objects.filter(id=self.post1.id).touch()
+        post.title = 'Changed title'
+        post.save()
+        self.assertEqual(post.version, self.post1.version + 2)
+        self.assertEqual(
+            models.Post.objects.get(id=self.post1.id).version,
+            post.version
+        )
+
     def test_user_can_delete_post(self):
         """Authenticated user can delete the posts."""
         post_data = td.create_post_data('test1', self.user1)
@@ -101,6 +236,166 @@ class PostApiTestCase(APITestCase):
         self.assertEqual(models.Post.objects.count(), posts_cnt - 1)
         self.assertFalse(models.Post.objects.filter(id=new_post.id).exists())
 
+    def test_user_can_bulk_create_posts(self):
+        """The valid posts of the list are created by a constant number
+        of queries and the result of every item is returned."""
+        url = reverse('api:post-bulk')
+        data = [
+            {'title': f'Bulk {i}', 'text': f'Bulk text {i}',
+             'tags': [self.tag1.id]}
+            for i in range(5)
+        ]
+        data.append({'title': 'Bulk', 'text': 'Bulk', 'tags': [0]})
+        with self.assertNumQueries(7):
+            response = self.auth_client.post(url, data=data, format='json')
+        results = response.json()
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [result['status'] for result in results],
+            [status.HTTP_201_CREATED] * 5 + [status.HTTP_400_BAD_REQUEST]
+        )
+        self.assertIn('tags', results[-1]['errors'])
+        post = models.Post.objects.get(id=results[0]['data']['id'])
+        self.assertEqual(post.text, 'Bulk text 0')
+        self.assertIsNotNone(post.search_vector)
+        self.assertEqual(post.author, self.user1)
+        self.assertEqual(list(post.tags.all()), [self.tag1])
+        self.assertEqual(results[0]['data']['tags'], [self.tag1.id])
+
+    def test_bulk_create_saves_items_one_by_one_by_default(self):
+        """The items are saved by perform_create() without the bulk
+        insert of the view."""
+        with mock.patch.object(
+            views.PostViewSet,
+            'perform_bulk_create',
+            BulkCreateMixin.perform_bulk_create
+        ):
+            response = self.auth_client.post(
+                reverse('api:post-bulk'),
+                data=[{'title': 'One', 'text': 'One', 'tags': [self.tag1.id]}],
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = models.Post.objects.get(id=response.json()[0]['data']['id'])
+        self.assertEqual(post.author, self.user1)
+        self.assertEqual(post.text, 'One')
+
+    def test_user_can_search_posts(self):
+        """The posts matching the query are ranked by the title above
+        the text, the vector of the text is kept on a title change."""
+        first = models.Post.objects.create(
+            **td.create_post_data('first', self.user1)
+        )
+        first.text = 'The apple pie recipe'
+        first.save()
+        second = models.Post.objects.create(
+            **td.create_post_data('second', self.user1)
+        )
+        second.title = 'Apples'
+        second.save()
+        url = reverse('api:post-search')
+        response = self.auth_client.get(url, {'q': 'apple'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(
+            [post['id'] for post in response.json()['results']],
+            [second.id, first.id]
+        )
+        response = self.auth_client.get(url, {'q': 'second text'})
+        self.assertEqual(
+            [post['id'] for post in response.json()['results']],
+            [second.id]
+        )
+
+    def test_user_can_list_public_posts(self):
+        """Only the posts shared by the unexpired reports are public,
+        the list is filtered by the "is_public" parameter."""
+        post = models.Post.objects.create(
+            **td.create_post_data('public', self.user1)
+        )
+        self.auth_client.post(
+            reverse('api:report-list'),
+            data=td.create_report_data(post.id)
+        )
+        url = reverse('api:post-list')
+        public_response = self.auth_client.get(url, {'is_public': 'true'})
+        private_response = self.auth_client.get(url, {'is_public': 'false'})
+        self.assertEqual(
+            [post['id'] for post in public_response.json()['results']],
+            [post.id]
+        )
+        self.assertTrue(public_response.json()['results'][0]['is_public'])
+        self.assertNotIn(
+            post.id,
+            [post['id'] for post in private_response.json()['results']]
+        )
+        response = self.auth_client.get(url, {'is_public': 'yes'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_posts_sparse_fields(self):
+        """Only the fields of the "fields" parameter are rendered,
+        the ones of the "omit" parameter are left out."""
+        url = reverse('api:post-list')
+        fields_response = self.auth_client.get(url, {'fields': 'id,title'})
+        omit_response = self.auth_client.get(
+            url,
+            {'omit': 'text,author.email'}
+        )
+        self.assertEqual(
+            fields_response.json()['results'],
+            [{'id': self.post1.id, 'title': self.post1.title}]
+        )
+        post_data = omit_response.json()['results'][0]
+        self.assertNotIn('text', post_data)
+        self.assertEqual(
+            post_data['author'],
+            {'id': self.user1.id, 'username': self.user1.username}
+        )
+
+    def test_list_posts_unknown_fields(self):
+        """The unknown fields of the "fields" and "omit" parameters
+        are rejected with the list of the valid ones."""
+        url = reverse('api:post-list')
+        for params in (
+            {'fields': 'id,bogus'},
+            {'omit': 'author.bogus'},
+            {'compact': 'true', 'fields': 'text'}
+        ):
+            response = self.auth_client.get(url, params)
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_400_BAD_REQUEST
+            )
+        self.assertIn('author.username', response.json()['fields'])
+
+    def test_compact_list_posts(self):
+        """The compact list renders the preview of the text
+        and the compact author."""
+        post = models.Post.objects.create(
+            **td.create_post_data('compact', self.user1)
+        )
+        post.text = 'Long text ' * settings.TEXT_PREVIEW_LENGTH
+        post.save()
+        response = self.auth_client.get(
+            reverse('api:post-list'),
+            {'compact': 'true'}
+        )
+        post_data = response.json()['results'][0]
+        self.assertEqual(
+            post_data['text_preview'],
+            post.text[:settings.TEXT_PREVIEW_LENGTH]
+        )
+        self.assertNotIn('text', post_data)
+        self.assertEqual(
+            post_data['author'],
+            {'id': self.user1.id, 'username': self.user1.username}
+        )
+
+    def test_search_expects_query(self):
+        """The search without the query is rejected."""
+        response = self.auth_client.get(reverse('api:post-search'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class ReportApiTestCase(APITestCase):
     @classmethod
@@ -113,7 +408,7 @@ class ReportApiTestCase(APITestCase):
         cls.tag1 = models.Tag.objects.create(**tag1_data)
         post1_data = td.create_post_data('mixin1', cls.user1,)
         cls.post1 = models.Post.objects.create(**post1_data)
-        cls.post1.tags.set([cls.tag1])
+        cls.post1.set_tags([cls.tag1])
         report1_data = td.create_report_data(cls.post1)
         cls.report1 = models.Report.objects.create(**report1_data)
 
@@ -131,7 +426,18 @@ class ReportApiTestCase(APITestCase):
             many=True
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.json()['results'], serializer.data)
+
+    def test_list_reports_sparse_fields(self):
+        """The fields of the post are requested by their paths."""
+        response = self.auth_client.get(
+            reverse('api:report-list'),
+            {'fields': 'slug,post.title'}
+        )
+        self.assertEqual(
+            response.json()['results'],
+            [{'slug': self.report1.slug, 'post': {'title': self.post1.title}}]
+        )
 
     def test_user_can_create_report(self):
         """Authenticated user can create a posts."""
@@ -142,9 +448,67 @@ class ReportApiTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(models.Report.objects.count(), report_cnt + 1)
 
+    def test_report_is_retrieved_by_slug(self):
+        """The created report is addressed by its base62 slug
+        and not by the numeric id."""
+        url = reverse('api:report-list')
+        data = td.create_report_data(self.post1.id)
+        slug = self.auth_client.post(url, data=data).data['slug']
+        slug_response = self.auth_client.get(
+            reverse('api:report-detail', args=(slug,))
+        )
+        id_response = self.auth_client.get(
+            reverse('api:report-detail', args=(self.report1.id,))
+        )
+        self.assertRegex(slug, r'^[0-9A-Za-z]{8}$')
+        self.assertEqual(slug_response.json()['slug'], slug)
+        self.assertEqual(id_response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_created_report_invalidates_cached_lists(self):
+        """The created report appears in the cached list of reports
+        and the post becomes public in the cached list of posts."""
+        post = models.Post.objects.create(
+            **td.create_post_data('test', self.user1)
+        )
+        reports_url = reverse('api:report-list')
+        posts_url = reverse('api:post-list')
+        self.auth_client.get(reports_url)
+        self.auth_client.get(posts_url)
+        report_data = td.create_report_data(post.id)
+        report_data['expire_time'] += timedelta(days=1)
+        response = self.auth_client.post(reports_url, data=report_data)
+        reports_response = self.auth_client.get(reports_url)
+        posts_response = self.auth_client.get(posts_url)
+        self.assertEqual(
+            reports_response.json()['results'][-1]['id'],
+            response.data['id']
+        )
+        self.assertTrue(posts_response.json()['results'][0]['is_public'])
+
+    def test_user_can_search_reports(self):
+        """Only the unexpired reports are found by their posts."""
+        post = models.Post.objects.create(
+            title='Expired',
+            text='The shared recipe',
+            author=self.user1
+        )
+        models.Report.objects.create(
+            post=post,
+            expire_time=timezone.now() - timedelta(days=1)
+        )
+        response = self.auth_client.get(
+            reverse('api:report-search'),
+            {'q': 'recipe or mixin1'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [report['slug'] for report in response.json()['results']],
+            [self.report1.slug]
+        )
+
     def test_user_can_retrieve_report(self):
         """Authenticated user can retrieve the report."""
-        url = reverse('api:report-detail', args=(self.report1.id,))
+        url = reverse('api:report-detail', args=(self.report1.slug,))
         response = self.auth_client.get(url)
         context = {'request': APIRequestFactory().get('/')}
         serializer = serializers.ReportViewSerializer(
@@ -152,7 +516,217 @@ class ReportApiTestCase(APITestCase):
             context=context
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.json(), serializer.data)
+
+    def test_retrieve_report_not_modified(self):
+        """The report is not sent again to the client with the current
+        ETag or Last-Modified, even if it is not in the cache."""
+        url = reverse('api:report-detail', args=(self.report1.slug,))
+        response = self.auth_client.get(url)
+        cache.clear()
+        etag_response = self.auth_client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        cache.clear()
+        last_modified_response = self.auth_client.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(
+            etag_response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(
+            last_modified_response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_stale_report_is_served_while_refreshing(self):
+        """The stale cache entry is served without queries
+        while another worker holds the refresh lock."""
+        url = reverse('api:report-detail', args=(self.report1.slug,))
+        obj_cache_name = f'report_cache/{self.report1.slug}'
+        stale_body = b'{"stale":true}'
+        cache.set(obj_cache_name, {
+            'body': stale_body,
+            'encoding': 'identity',
+            'etag': '"stale"',
+            'last_modified': None,
+            'stale_at': 0
+        })
+        cache.set(f'{obj_cache_name}/lock', 1)
+        with self.assertNumQueries(0):
+            response = self.auth_client.get(url)
+        self.assertEqual(response.content, stale_body)
+        self.assertEqual(response['ETag'], '"stale"')
+
+    def test_stale_report_is_refreshed(self):
+        """The stale cache entry is refreshed by the worker
+        that takes the lock, and the lock is released."""
+        url = reverse('api:report-detail', args=(self.report1.slug,))
+        obj_cache_name = f'report_cache/{self.report1.slug}'
+        cache.set(obj_cache_name, {
+            'body': b'{"stale":true}',
+            'encoding': 'identity',
+            'etag': '"stale"',
+            'last_modified': None,
+            'stale_at': 0
+        })
+        response = self.auth_client.get(url)
+        self.assertEqual(response.json()['id'], self.report1.id)
+        self.assertGreater(cache.get(obj_cache_name)['stale_at'], 0)
+        self.assertIsNone(cache.get(f'{obj_cache_name}/lock'))
+
+    def test_large_report_is_cached_compressed(self):
+        """The large rendered report is gzipped in the cache and
+        the cached body is returned with its ETag."""
+        post = models.Post.objects.create(
+            title='Large post',
+            text='log line\n' * 1000,
+            author=self.user1
+        )
+        report = models.Report.objects.create(
+            **td.create_report_data(post)
+        )
+        url = reverse('api:report-detail', args=(report.slug,))
+        response = self.auth_client.get(url)
+        cache_entry = cache.get(f'report_cache/{report.slug}')
+        with self.assertNumQueries(0):
+            cached_response = self.auth_client.get(url)
+        self.assertEqual(cache_entry['encoding'], 'gzip')
+        self.assertLess(len(cache_entry['body']), len(response.content))
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(cached_response['ETag'], cache_entry['etag'])
+
+    def test_gzipped_report_is_sent_as_is(self):
+        """The gzipped cached report is sent without decompressing
+        to the client accepting gzip."""
+        post = models.Post.objects.create(
+            title='Large post',
+            text='log line\n' * 1000,
+            author=self.user1
+        )
+        report = models.Report.objects.create(
+            **td.create_report_data(post)
+        )
+        url = reverse('api:report-detail', args=(report.slug,))
+        response = self.auth_client.get(url)
+        gzip_response = self.auth_client.get(
+            url,
+            HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        not_modified_response = self.auth_client.get(
+            url,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=gzip_response['ETag']
+        )
+        self.assertEqual(gzip_response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(gzip_response.content),
+            response.content
+        )
+        self.assertNotEqual(gzip_response['ETag'], response['ETag'])
+        self.assertEqual(
+            not_modified_response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        cache.clear()
+        with self.assertNumQueries(1):
+            uncached_response = self.auth_client.get(
+                url,
+                HTTP_ACCEPT_ENCODING='gzip',
+                HTTP_IF_NONE_MATCH=gzip_response['ETag']
+            )
+        self.assertEqual(
+            uncached_response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(uncached_response['ETag'], gzip_response['ETag'])
+
+    def test_report_cache_lifetime_is_capped_by_expire_time(self):
+        """The report is cached no longer than until its expire time."""
+        report_data = td.create_report_data(self.post1)
+        report_data['expire_time'] = timezone.now() + timedelta(minutes=3)
+        report = models.Report.objects.create(**report_data)
+        url = reverse('api:report-detail', args=(report.slug,))
+        self.auth_client.get(url)
+        cache_entry = cache.get(f'report_cache/{report.slug}')
+        self.assertLessEqual(
+            cache_entry['stale_at'],
+            report.expire_time.timestamp()
+        )
+
+    def test_raw_report_text_is_streamed(self):
+        """The text of the report is streamed as plain text."""
+        url = reverse('api:report-raw', args=(self.report1.slug,))
+        response = self.auth_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            b''.join(response.streaming_content),
+            self.post1.text.encode()
+        )
+        self.assertEqual(
+            response['Content-Length'],
+            str(len(self.post1.text.encode()))
+        )
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_raw_report_text_range(self):
+        """The byte range of the large compressed text is sent."""
+        text = ''.join(f'log line {i}\n' for i in range(1000))
+        post = models.Post.objects.create(
+            title='Large post',
+            text=text,
+            author=self.user1
+        )
+        report = models.Report.objects.create(
+            **td.create_report_data(post)
+        )
+        url = reverse('api:report-raw', args=(report.slug,))
+        range_response = self.auth_client.get(url, HTTP_RANGE='bytes=100-199')
+        tail_response = self.auth_client.get(url, HTTP_RANGE='bytes=-50')
+        invalid_response = self.auth_client.get(
+            url,
+            HTTP_RANGE=f'bytes={len(text)}-'
+        )
+        gzip_response = self.auth_client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(
+            range_response.status_code,
+            status.HTTP_206_PARTIAL_CONTENT
+        )
+        self.assertEqual(
+            b''.join(range_response.streaming_content),
+            text[100:200].encode()
+        )
+        self.assertEqual(
+            range_response['Content-Range'],
+            f'bytes 100-199/{len(text)}'
+        )
+        self.assertEqual(
+            b''.join(tail_response.streaming_content),
+            text[-50:].encode()
+        )
+        self.assertEqual(
+            invalid_response.status_code,
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(gzip_response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(gzip_response.streaming_content)),
+            text.encode()
+        )
+        not_modified_response = self.auth_client.get(
+            url,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=gzip_response['ETag']
+        )
+        self.assertEqual(
+            not_modified_response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(not_modified_response['ETag'], gzip_response['ETag'])
 
     def test_user_can_patch_report(self):
         """Authenticated user can patch a posts."""
@@ -161,7 +735,7 @@ class ReportApiTestCase(APITestCase):
         another_post_data = td.create_post_data('test', report.post.author)
         another_post = models.Post.objects.create(**another_post_data)
         patch_data = {'post': another_post.id}
-        url = reverse('api:report-detail', args=(report.id,))
+        url = reverse('api:report-detail', args=(report.slug,))
         response = self.auth_client.patch(url, data=patch_data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['post'], another_post.id)
@@ -171,7 +745,7 @@ class ReportApiTestCase(APITestCase):
         report_data = td.create_report_data(self.post1)
         report = models.Report.objects.create(**report_data)
         reports_cnt = models.Report.objects.count()
-        url = reverse('api:report-detail', args=(report.id,))
+        url = reverse('api:report-detail', args=(report.slug,))
         response = self.auth_client.delete(url)
         new_response = self.auth_client.get(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
@@ -201,3 +775,199 @@ class ReportApiTestCase(APITestCase):
         response = self.auth_client.post(url, test_report_data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(models.Report.objects.count(), reports_cnt)
+
+    def test_user_can_bulk_create_reports(self):
+        """The reports are created only for the user's own posts,
+        get the slugs and are scheduled to expire."""
+        other_user = models.User.objects.create(
+            **td.create_user_data('other')
+        )
+        other_post = models.Post.objects.create(
+            **td.create_post_data('other', other_user)
+        )
+        url = reverse('api:report-bulk')
+        expire_time = timezone.now() + timedelta(days=1)
+        data = [
+            {'post': self.post1.id, 'expire_time': expire_time},
+            {'post': self.post1.id, 'expire_time': expire_time},
+            {'post': other_post.id, 'expire_time': expire_time}
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.auth_client.post(url, data=data, format='json')
+        results = response.json()
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertIn('post', results[2]['errors'])
+        slugs = [result['data']['slug'] for result in results[:2]]
+        reports = models.Report.objects.filter(slug__in=slugs)
+        self.assertEqual(len(reports), 2)
+        self.assertFalse(
+            models.Report.objects.filter(post=other_post).exists()
+        )
+        for report in reports:
+            self.assertIsNotNone(
+                get_redis().zscore(
+                    settings.REPORT_EXPIRY_SCHEDULE_KEY,
+                    report.id
+                )
+            )
+
+    def test_bulk_created_reports_drop_post_cache_after_commit(self):
+        """The cache entry of the post filled by another request before
+        the commit of the reports is dropped after the commit."""
+        post_url = reverse('api:post-detail', args=(self.post1.id,))
+        obj_cache_name = get_obj_cache_name(
+            'post',
+            self.post1.id,
+            self.user1.id
+        )
+        data = [{
+            'post': self.post1.id,
+            'expire_time': timezone.now() + timedelta(days=1)
+        }]
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.auth_client.post(
+                reverse('api:report-bulk'),
+                data=data,
+                format='json'
+            )
+            self.auth_client.get(post_url)
+        self.assertIsNotNone(get_cached(obj_cache_name))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(get_cached(obj_cache_name))
+
+    def test_bulk_create_expects_list(self):
+        """The bulk request of not a list is rejected."""
+        url = reverse('api:report-bulk')
+        response = self.auth_client.post(
+            url,
+            data={'post': self.post1.id},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TagApiTestCase(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user1 = models.User.objects.create(**td.create_user_data('tag1'))
+        cls.tag1 = models.Tag.objects.create(**td.create_tag_data('tag1'))
+        cls.tag2 = models.Tag.objects.create(**td.create_tag_data('tag2'))
+
+    def setUp(self):
+        cache.clear()
+        self.auth_client = APIClient()
+        self.auth_client.force_authenticate(self.user1)
+
+    def get_counts(self, tag):
+        tag.refresh_from_db()
+        return tag.post_count, tag.report_count
+
+    def create_report(self, post_id, days=1):
+        expire_time = timezone.now() + timedelta(days=days)
+        return self.auth_client.post(
+            reverse('api:report-list'),
+            data={'post': post_id, 'expire_time': expire_time}
+        ).data['slug']
+
+    def test_tag_counts_follow_changes(self):
+        """The counts of the tags follow the posts, their tags
+        and their reports."""
+        post_id = self.auth_client.post(
+            reverse('api:post-list'),
+            data={'title': 'Title', 'text': 'Text', 'tags': [self.tag1.id]}
+        ).data['id']
+        slug = self.create_report(post_id)
+        self.assertEqual(self.get_counts(self.tag1), (1, 1))
+        post_url = reverse('api:post-detail', args=(post_id,))
+        self.auth_client.patch(post_url, data={'tags': [self.tag2.id]})
+        self.assertEqual(self.get_counts(self.tag1), (0, 0))
+        self.assertEqual(self.get_counts(self.tag2), (1, 1))
+        self.auth_client.delete(reverse('api:report-detail', args=(slug,)))
+        self.assertEqual(self.get_counts(self.tag2), (1, 0))
+        self.create_report(post_id)
+        self.auth_client.delete(post_url)
+        self.assertEqual(self.get_counts(self.tag2), (0, 0))
+
+    def test_admin_sets_tags_with_counts(self):
+        """The tags of the post saved in the admin are counted
+        and copied to its tag_ids."""
+        admin = models.User.objects.create_superuser(
+            **td.create_user_data('admin')
+        )
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:posts_post_add'),
+            data={
+                'title': 'Title',
+                'text': 'Text',
+                'author': self.user1.id,
+                'tags': [self.tag1.id]
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        post = models.Post.objects.get(title='Title')
+        self.assertEqual(post.tag_ids, [self.tag1.id])
+        self.assertEqual(self.get_counts(self.tag1), (1, 0))
+
+    def test_user_can_list_tags(self):
+        """The tags are listed by name with their counts."""
+        response = self.auth_client.get(reverse('api:tag-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()['results'],
+            serializers.TagSerializer([self.tag1, self.tag2], many=True).data
+        )
+
+    def test_user_can_list_reports_by_tag(self):
+        """Only the unexpired reports of the posts with the tag
+        are listed, from the soonest to expire."""
+        post_ids = [
+            self.auth_client.post(
+                reverse('api:post-list'),
+                data={'title': 'Title', 'text': 'Text', 'tags': [tag.id]}
+            ).data['id']
+            for tag in (self.tag1, self.tag1, self.tag2)
+        ]
+        later = self.create_report(post_ids[0], days=2)
+        sooner = self.create_report(post_ids[1], days=1)
+        self.create_report(post_ids[2])
+        expired = models.Report.objects.create(
+            post_id=post_ids[0],
+            expire_time=timezone.now() - timedelta(days=1)
+        )
+        models.ReportTag.objects.index_reports([expired.id], created=True)
+        response = self.auth_client.get(
+            reverse('api:tag-reports', args=(self.tag1.id,))
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [report['slug'] for report in response.json()['results']],
+            [sooner, later]
+        )
+
+    def test_anonymous_user_can_not_read_tags(self):
+        """The tags and their reports are read only by the users."""
+        for url in (
+            reverse('api:tag-list'),
+            reverse('api:tag-detail', args=(self.tag1.id,)),
+            reverse('api:tag-reports', args=(self.tag1.id,))
+        ):
+            response = self.client.get(url)
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_401_UNAUTHORIZED
+            )
+
+    def test_reports_of_unknown_tag_are_not_found(self):
+        """The reports of the unknown or invalid tag are not found."""
+        for tag_id in (self.tag2.id + 1000, 'abc'):
+            response = self.auth_client.get(
+                reverse('api:tag-reports', args=(tag_id,))
+            )
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_404_NOT_FOUND
+            )
@@ -0,0 +1,83 @@
+import json
+
+from django.core.cache import cache
+from django.shortcuts import reverse
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, TestCase
+from django.urls import resolve
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.tests import utils as td
+from posts import models
+
+
+class AsyncReportReadTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = models.User.objects.create(
+            **td.create_user_data('mixin1')
+        )
+        self.post1 = models.Post.objects.create(
+            **td.create_post_data('mixin1', self.user1)
+        )
+        self.report1 = models.Report.objects.create(
+            **td.create_report_data(self.post1)
+        )
+        self.token = AccessToken.for_user(self.user1)
+
+    def get(self, url, authorized=True, **meta):
+        """Calls the async view of the url by the ASGI request."""
+        request = AsyncRequestFactory().get(url)
+        request.META.update(meta)
+        if authorized:
+            request.META['HTTP_AUTHORIZATION'] = f'Bearer {self.token}'
+        match = resolve(url)
+        return async_to_sync(match.func)(request, **match.kwargs)
+
+    def test_cached_report_is_read_async(self):
+        """The cached report is served by the async view with the
+        user loaded by the async ORM and no other queries."""
+        url = reverse('api:report-detail', args=(self.report1.slug,))
+        response = self.get(url)
+        with self.assertNumQueries(1):
+            cached_response = self.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(cached_response['ETag'], response['ETag'])
+
+    def test_cached_reports_page_is_read_async(self):
+        """The cached page of reports is served by the async view."""
+        url = reverse('api:report-list')
+        response = self.get(url)
+        with self.assertNumQueries(1):
+            cached_response = self.get(url)
+        self.assertEqual(cached_response.content, response.content)
+
+    def test_report_not_modified_is_checked_async(self):
+        """The 304 response is sent by the validators loaded by the
+        async ORM when the report is not in the cache."""
+        url = reverse('api:report-detail', args=(self.report1.slug,))
+        etag = self.get(url)['ETag']
+        cache.clear()
+        with self.assertNumQueries(2):
+            response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_user_is_loaded_once_on_cache_miss(self):
+        """The sync view serving the cache miss gets the user loaded
+        by the async view, only the report and its text are loaded."""
+        url = reverse('api:report-detail', args=(self.report1.slug,))
+        with self.assertNumQueries(3):
+            response = self.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            json.loads(response.content)['slug'],
+            self.report1.slug
+        )
+
+    def test_unauthenticated_read_is_rejected(self):
+        """The request without the token is passed to the sync view."""
+        url = reverse('api:report-detail', args=(self.report1.slug,))
+        response = self.get(url, authorized=False)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
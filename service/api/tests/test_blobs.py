@@ -0,0 +1,129 @@
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from api.tests import utils
+from posts import models
+from posts.blobs import DatabaseBlobStore, FileSystemBlobStore, get_digest
+
+
+class TestPostText(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        user1_data = utils.create_user_data('mixin1')
+        cls.user1 = models.User.objects.create(**user1_data)
+
+    def test_identical_texts_are_stored_once(self):
+        """The posts with the same text share one blob."""
+        post1 = models.Post.objects.create(
+            **utils.create_post_data('same', self.user1)
+        )
+        post2 = models.Post.objects.create(
+            **utils.create_post_data('same', self.user1)
+        )
+        self.assertEqual(post1.text_digest, post2.text_digest)
+        self.assertEqual(
+            models.Blob.objects.filter(digest=post1.text_digest).count(),
+            1
+        )
+
+    def test_text_is_loaded_on_demand(self):
+        """The text is loaded from the blob store
+        only when it is accessed."""
+        post_data = utils.create_post_data('lazy', self.user1)
+        post = models.Post.objects.create(**post_data)
+        with self.assertNumQueries(1):
+            post = models.Post.objects.get(id=post.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(post.text, post_data['text'])
+
+    def test_large_text_is_stored_compressed(self):
+        """The large text is gzipped in the blob store
+        and decompressed when accessed."""
+        text = 'log line\n' * 1000
+        post = models.Post.objects.create(
+            title='Large post',
+            text=text,
+            author=self.user1
+        )
+        blob = models.Blob.objects.get(digest=post.text_digest)
+        self.assertEqual(blob.encoding, 'gzip')
+        self.assertLess(len(blob.data), len(text))
+        self.assertEqual(models.Post.objects.get(id=post.id).text, text)
+
+    def test_texts_are_prefetched_at_once(self):
+        """The texts of many posts are loaded with one query."""
+        for i in range(3):
+            models.Post.objects.create(
+                **utils.create_post_data(f'prefetch{i}', self.user1)
+            )
+        posts = list(models.Post.objects.all())
+        with self.assertNumQueries(1):
+            models.Post.prefetch_texts(posts)
+            texts = [post.text for post in posts]
+        self.assertEqual(len(texts), 3)
+
+
+class TestBlobStores(TestCase):
+    def check_blob_store(self, blob_store):
+        large_data = b'data' * 2000
+        digest = blob_store.put(b'data')
+        blob_store.put(b'data')
+        large_digest = blob_store.put(large_data)
+        self.assertEqual(digest, get_digest(b'data'))
+        self.assertEqual(blob_store.get(digest), b'data')
+        self.assertEqual(blob_store.get(large_digest), large_data)
+        self.assertEqual(
+            blob_store.get_many([digest]),
+            {digest: ('identity', b'data')}
+        )
+        encoding, _ = blob_store.get_many([large_digest])[large_digest]
+        self.assertEqual(encoding, 'gzip')
+        deleted = blob_store.delete_orphans(
+            models.Post.objects.values('text_digest'),
+            grace_period=-1
+        )
+        self.assertEqual(deleted, 2)
+
+    def test_database_blob_store(self):
+        """The database store keeps, returns and deletes the blobs."""
+        self.check_blob_store(DatabaseBlobStore())
+
+    def test_file_system_blob_store(self):
+        """The file system store keeps, returns and deletes the blobs."""
+        with tempfile.TemporaryDirectory() as root:
+            self.check_blob_store(FileSystemBlobStore(root))
+
+    def test_database_reused_blob_is_kept(self):
+        """The old orphan blob reused by a new post is not deleted."""
+        blob_store = DatabaseBlobStore()
+        digest = blob_store.put(b'data')
+        models.Blob.objects.filter(digest=digest).update(
+            created_at=timezone.now() - timedelta(hours=2)
+        )
+        blob_store.put(b'data')
+        deleted = blob_store.delete_orphans(
+            models.Post.objects.values('text_digest'),
+            grace_period=60 * 60
+        )
+        self.assertEqual(deleted, 0)
+
+    def test_file_system_reused_blob_is_kept(self):
+        """The old orphan file reused by a new post is not deleted."""
+        with tempfile.TemporaryDirectory() as root:
+            blob_store = FileSystemBlobStore(root)
+            digest = blob_store.put(b'data')
+            old_time = time.time() - 2 * 60 * 60
+            os.utime(blob_store.get_path(digest), (old_time, old_time))
+            blob_store.put(b'data')
+            deleted = blob_store.delete_orphans(
+                models.Post.objects.values('text_digest'),
+                grace_period=60 * 60
+            )
+            self.assertEqual(deleted, 0)
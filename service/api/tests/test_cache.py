@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api import cache as two_tier_cache
+from api.tests import utils as td
+from posts import models
+
+
+class TestLocalCache(SimpleTestCase):
+    def test_evicts_least_recently_used_entry(self):
+        """The least recently used entry is evicted
+        when the number of entries is exceeded."""
+        local_cache = two_tier_cache.LocalCache(2, 1024, 60)
+        local_cache.set('first', 1, 1)
+        local_cache.set('second', 2, 1)
+        local_cache.get('first')
+        local_cache.set('third', 3, 1)
+        self.assertEqual(local_cache.get('first'), 1)
+        self.assertIsNone(local_cache.get('second'))
+        self.assertEqual(local_cache.get('third'), 3)
+
+    def test_evicts_entries_beyond_max_bytes(self):
+        """The entries are evicted when their total size is exceeded."""
+        local_cache = two_tier_cache.LocalCache(10, 100, 60)
+        local_cache.set('first', 1, 60)
+        local_cache.set('second', 2, 60)
+        self.assertIsNone(local_cache.get('first'))
+        self.assertEqual(local_cache.size, 60)
+
+    def test_entry_expires(self):
+        """The entry is not returned after its lifetime."""
+        local_cache = two_tier_cache.LocalCache(10, 100, 60)
+        local_cache.set('first', 1, 1, lifetime=0)
+        self.assertIsNone(local_cache.get('first'))
+
+
+@override_settings(LOCAL_CACHE_ENABLED=True)
+@mock.patch('api.cache.start_invalidation_listener')
+class TestTwoTierCache(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        two_tier_cache.local_cache.clear()
+        two_tier_cache.cache_stats.clear()
+
+    def test_value_is_served_from_local_cache(self, start_listener):
+        """The value read from Redis is then served by the local cache."""
+        cache.set('key', 'value')
+        two_tier_cache.get_cached('key')
+        self.assertEqual(two_tier_cache.get_cached('key'), 'value')
+        self.assertEqual(two_tier_cache.cache_stats['redis_hits'], 1)
+        self.assertEqual(two_tier_cache.cache_stats['local_hits'], 1)
+
+    def test_deleted_value_is_published(self, start_listener):
+        """The deleted keys are removed from both tiers
+        and published to the other workers."""
+        two_tier_cache.set_cached('key', 'value', 60)
+        with mock.patch.object(two_tier_cache, 'get_redis') as get_redis:
+            two_tier_cache.delete_cached(['key'])
+        get_redis.return_value.publish.assert_called_once()
+        self.assertIsNone(two_tier_cache.get_cached('key'))
+        self.assertEqual(two_tier_cache.cache_stats['local_misses'], 1)
+        self.assertEqual(two_tier_cache.cache_stats['redis_misses'], 1)
+
+
+@mock.patch('api.cache.start_invalidation_listener')
+class TestTagCache(TestCase):
+    def setUp(self):
+        two_tier_cache.tag_cache.clear()
+        self.tag = models.Tag.objects.create(**td.create_tag_data('cached'))
+
+    def test_tags_are_loaded_once(self, start_listener):
+        """The tags are loaded by one query and then served by the map."""
+        tag_cache = two_tier_cache.TagCache()
+        with self.assertNumQueries(1):
+            tag_cache.get_tags()
+            tags = tag_cache.get_tags()
+        self.assertEqual(tags[self.tag.id].name, self.tag.name)
+
+    def test_missing_tags_are_loaded_once(self, start_listener):
+        """The map is loaded again for the tag created after the load,
+        but not for the deleted tag on every use."""
+        tag_cache = two_tier_cache.TagCache()
+        tag_cache.get_tags()
+        tag = models.Tag.objects.bulk_create([
+            models.Tag(**td.create_tag_data('created'))
+        ])[0]
+        with self.assertNumQueries(1):
+            tags = tag_cache.get_tags([self.tag.id, tag.id])
+            tag_cache.get_tags([self.tag.id, tag.id])
+        with self.assertNumQueries(1):
+            tag_cache.get_tags([tag.id + 1000])
+            tag_cache.get_tags([tag.id + 1000])
+        self.assertEqual(tags[tag.id].name, tag.name)
+
+    def test_changed_tag_is_published(self, start_listener):
+        """The change of the tag drops the map of all the workers."""
+        two_tier_cache.tag_cache.get_tags()
+        with mock.patch.object(two_tier_cache, 'get_redis') as get_redis:
+            self.tag.delete()
+        get_redis.return_value.publish.assert_called_once()
+        self.assertNotIn(self.tag.id, two_tier_cache.tag_cache.get_tags())
@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.shortcuts import reverse
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient, APITestCase
+
+from api.tests import utils as td
+from app import db_routers
+from posts import models
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+@mock.patch('app.db_routers.check_replica_lag', return_value=0.1)
+class TestReplicaRouter(SimpleTestCase):
+    def setUp(self):
+        db_routers._replica_lags.clear()
+        self.router = db_routers.ReplicaRouter()
+
+    def test_reads_go_to_primary_by_default(self, check_lag):
+        """The reads outside the use_replicas() block and the writes
+        go to the primary."""
+        self.assertEqual(self.router.db_for_read(models.Post), 'default')
+        with db_routers.use_replicas():
+            self.assertEqual(self.router.db_for_write(models.Post), 'default')
+        check_lag.assert_not_called()
+
+    def test_reads_go_to_replica(self, check_lag):
+        """The reads of the use_replicas() block go to the replica,
+        its lag is checked once in the check interval."""
+        with db_routers.use_replicas():
+            self.assertEqual(self.router.db_for_read(models.Post), 'replica_0')
+            self.assertEqual(self.router.db_for_read(models.Post), 'replica_0')
+        check_lag.assert_called_once_with('replica_0')
+
+    @override_settings(REPLICA_MAX_LAG=0.01)
+    def test_lagging_replica_is_skipped(self, check_lag):
+        """The reads go to the primary if the replica lags too much."""
+        with db_routers.use_replicas():
+            self.assertEqual(self.router.db_for_read(models.Post), 'default')
+
+    def test_unavailable_replica_is_skipped(self, check_lag):
+        """The reads go to the primary if the replica is unavailable."""
+        check_lag.return_value = None
+        with db_routers.use_replicas():
+            self.assertEqual(self.router.db_for_read(models.Post), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+@mock.patch('app.db_routers.get_replica', return_value='default')
+class TestReplicaReads(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = models.User.objects.create(**td.create_user_data('rr'))
+        cls.tag = models.Tag.objects.create(**td.create_tag_data('rr'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_is_read_from_replica(self, get_replica):
+        """The page missing in the cache is read from the replica."""
+        self.client.get(reverse('api:post-list'))
+        get_replica.assert_called()
+
+    def test_user_reads_own_writes_from_primary(self, get_replica):
+        """The user is pinned to the primary after the write."""
+        response = self.client.post(
+            reverse('api:post-list'),
+            {'title': 'Title', 'text': 'Text', 'tags': [self.tag.id]},
+            format='json'
+        )
+        self.client.get(
+            reverse('api:post-detail', args=[response.data['id']])
+        )
+        self.client.get(reverse('api:post-list'))
+        get_replica.assert_not_called()
@@ -0,0 +1,101 @@
+from django.core.cache import cache
+from django.shortcuts import reverse
+from django.test import AsyncClient
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.cache import tag_cache
+from api.tests import utils as td
+from posts import models
+
+
+class MetricsMiddlewareTestCase(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user1 = models.User.objects.create(
+            **td.create_user_data('mixin1')
+        )
+        cls.post1 = models.Post.objects.create(
+            **td.create_post_data('mixin1', cls.user1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        tag_cache.get_tags()
+        self.auth_client = APIClient()
+        self.auth_client.force_authenticate(self.user1)
+
+    def get_sample_value(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_queries_are_recorded(self):
+        """The number of the queries and the cache events
+        of the request are recorded by its view."""
+        url = reverse('api:post-detail', args=(self.post1.id,))
+        labels = {'view': 'api:post-detail', 'method': 'GET'}
+        queries = self.get_sample_value(
+            'pastebin_request_db_queries_sum',
+            **labels
+        )
+        requests = self.get_sample_value(
+            'pastebin_request_duration_seconds_count',
+            **labels
+        )
+        hits = self.get_sample_value(
+            'pastebin_request_cache_events_total',
+            **labels,
+            event='redis_hits'
+        )
+        self.auth_client.get(url)
+        self.auth_client.get(url)
+        self.assertEqual(
+            self.get_sample_value('pastebin_request_db_queries_sum', **labels),
+            queries + 2
+        )
+        self.assertEqual(
+            self.get_sample_value(
+                'pastebin_request_duration_seconds_count',
+                **labels
+            ),
+            requests + 2
+        )
+        self.assertEqual(
+            self.get_sample_value(
+                'pastebin_request_cache_events_total',
+                **labels,
+                event='redis_hits'
+            ),
+            hits + 1
+        )
+
+    async def test_asgi_request_queries_are_recorded(self):
+        """The queries of the sync view are recorded under
+        the ASGI server, where the view is run in the thread."""
+        url = reverse('api:post-detail', args=(self.post1.id,))
+        labels = {'view': 'api:post-detail', 'method': 'GET'}
+        queries = self.get_sample_value(
+            'pastebin_request_db_queries_sum',
+            **labels
+        )
+        response = await AsyncClient().get(url, headers={
+            'Authorization': f'Bearer {AccessToken.for_user(self.user1)}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(
+            self.get_sample_value('pastebin_request_db_queries_sum', **labels),
+            queries
+        )
+
+    def test_metrics_are_exported(self):
+        """The metrics are exported in the Prometheus text format."""
+        self.auth_client.get(reverse('api:post-list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(
+            b'pastebin_request_duration_seconds_bucket',
+            response.content
+        )
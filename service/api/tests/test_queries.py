@@ -0,0 +1,391 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.shortcuts import reverse
+from django.urls import URLResolver
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import urls
+from api.cache import tag_cache
+from api.tests import utils as td
+from posts import models
+
+API_ROOT_URL = '/api/v1/'
+
+
+def get_url_names(patterns, prefix=''):
+    """Returns the pairs of the route prefix and the name
+    of every url of the patterns, including the nested ones."""
+    url_names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            url_names |= get_url_names(
+                pattern.url_patterns,
+                prefix + str(pattern.pattern)
+            )
+        else:
+            url_names.add((prefix, pattern.name))
+    return url_names
+
+
+class EndpointQueriesTestCase(APITestCase):
+    """Every endpoint of the api is requested with the empty cache
+    and makes the exact number of queries to the database. The tags
+    are rendered by the tag cache, which is kept warm. The account
+    flows of djoser sending the emails are not covered, they are
+    not set up for the api."""
+
+    covered_url_names = {
+        'api-root',
+        'post-list',
+        'post-detail',
+        'post-bulk',
+        'post-search',
+        'report-list',
+        'report-detail',
+        'report-raw',
+        'report-bulk',
+        'report-search',
+        'tag-list',
+        'tag-detail',
+        'tag-reports'
+    }
+    covered_auth_url_names = {
+        'api-root',
+        'user-list',
+        'user-me',
+        'user-detail',
+        'user-set-password',
+        'jwt-create',
+        'jwt-refresh',
+        'jwt-verify'
+    }
+    excluded_auth_url_names = {
+        'user-activation',
+        'user-resend-activation',
+        'user-reset-password',
+        'user-reset-password-confirm',
+        'user-reset-username',
+        'user-reset-username-confirm',
+        'user-set-username'
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user1 = models.User.objects.create(
+            **td.create_user_data('mixin1')
+        )
+        cls.tag1 = models.Tag.objects.create(**td.create_tag_data('mixin1'))
+        cls.post1 = models.Post.objects.create(
+            **td.create_post_data('mixin1', cls.user1)
+        )
+        cls.post1.set_tags([cls.tag1])
+        cls.report1 = models.Report.objects.create(
+            **td.create_report_data(cls.post1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        tag_cache.get_tags()
+        self.auth_client = APIClient()
+        self.auth_client.force_authenticate(self.user1)
+
+    def get_expire_time(self):
+        return (timezone.now() + timedelta(days=2)).isoformat()
+
+    def test_every_endpoint_is_covered(self):
+        """The tests below cover all the endpoints of the api, but
+        the excluded account flows of djoser."""
+        auth_url_names = (
+            self.covered_auth_url_names | self.excluded_auth_url_names
+        )
+        self.assertEqual(
+            get_url_names(urls.urlpatterns),
+            {('', name) for name in self.covered_url_names}
+            | {('auth/', name) for name in auth_url_names}
+        )
+
+    def test_api_root(self):
+        """The root of the api router makes no queries."""
+        with self.assertNumQueries(0):
+            response = self.auth_client.get(API_ROOT_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('posts', response.json())
+
+    def test_list_posts(self):
+        """The posts and their texts by one query each."""
+        with self.assertNumQueries(2):
+            response = self.auth_client.get(reverse('api:post-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_posts_compact(self):
+        """The posts with the previews of their texts."""
+        with self.assertNumQueries(1):
+            response = self.auth_client.get(
+                reverse('api:post-list'),
+                {'compact': 'true'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_create_post(self):
+        """The tag, the blob, the post, its tags and their counts."""
+        data = {'title': 'Title', 'text': 'Text', 'tags': [self.tag1.id]}
+        with self.assertNumQueries(5):
+            response = self.auth_client.post(
+                reverse('api:post-list'),
+                data=data
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_retrieve_post(self):
+        """The post and its text by one query each."""
+        url = reverse('api:post-detail', args=(self.post1.id,))
+        with self.assertNumQueries(2):
+            response = self.auth_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_post_not_modified(self):
+        """Only the validators of the post are loaded."""
+        url = reverse('api:post-detail', args=(self.post1.id,))
+        etag = self.auth_client.get(url)['ETag']
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_patch_post(self):
+        """The post is loaded, updated, its version and report columns
+        are loaded again and it is serialized."""
+        url = reverse('api:post-detail', args=(self.post1.id,))
+        with self.assertNumQueries(5):
+            response = self.auth_client.patch(
+                url,
+                data={'title': 'Changed title'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_post(self):
+        """The post is loaded without the related objects,
+        its tags are looked up to be uncounted."""
+        post = models.Post.objects.create(
+            **td.create_post_data('test', self.user1)
+        )
+        url = reverse('api:post-detail', args=(post.id,))
+        with self.assertNumQueries(6):
+            response = self.auth_client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_bulk_create_posts(self):
+        """The number of queries does not depend on the items."""
+        data = [
+            {'title': 'Title', 'text': 'Text', 'tags': [self.tag1.id]}
+        ] * 10
+        with self.assertNumQueries(7):
+            response = self.auth_client.post(
+                reverse('api:post-bulk'),
+                data=data,
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_search_posts(self):
+        """The count, the posts and their texts."""
+        with self.assertNumQueries(3):
+            response = self.auth_client.get(
+                reverse('api:post-search'),
+                {'q': 'text'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_reports(self):
+        """The reports with posts and their texts."""
+        with self.assertNumQueries(2):
+            response = self.auth_client.get(reverse('api:report-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_create_report(self):
+        """The post is looked up among the user's posts,
+        the report is indexed by its tags, which are counted."""
+        data = {'post': self.post1.id, 'expire_time': self.get_expire_time()}
+        with self.assertNumQueries(6):
+            response = self.auth_client.post(
+                reverse('api:report-list'),
+                data=data
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_retrieve_report(self):
+        """The report with the post and its text."""
+        url = reverse('api:report-detail', args=(self.report1.slug,))
+        with self.assertNumQueries(2):
+            response = self.auth_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_report_not_modified(self):
+        """Only the validators of the report are loaded."""
+        url = reverse('api:report-detail', args=(self.report1.slug,))
+        etag = self.auth_client.get(url)['ETag']
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_raw_report(self):
+        """The narrow report and the blob of the text."""
+        url = reverse('api:report-raw', args=(self.report1.slug,))
+        with self.assertNumQueries(2):
+            response = self.auth_client.get(url)
+            b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_patch_report(self):
+        """The report is loaded, updated, reindexed by its tags,
+        which are counted, and its post touched."""
+        url = reverse('api:report-detail', args=(self.report1.slug,))
+        data = {'expire_time': self.get_expire_time()}
+        with self.assertNumQueries(6):
+            response = self.auth_client.patch(url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_report(self):
+        """The report is loaded without the related objects,
+        its tag index is deleted before the report."""
+        report = models.Report.objects.create(
+            **td.create_report_data(self.post1)
+        )
+        url = reverse('api:report-detail', args=(report.slug,))
+        with self.assertNumQueries(5):
+            response = self.auth_client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_bulk_create_reports(self):
+        """The number of queries does not depend on the items."""
+        data = [
+            {'post': self.post1.id, 'expire_time': self.get_expire_time()}
+        ] * 10
+        with self.assertNumQueries(8):
+            response = self.auth_client.post(
+                reverse('api:report-bulk'),
+                data=data,
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_search_reports(self):
+        """The count, the reports with posts and their texts."""
+        with self.assertNumQueries(3):
+            response = self.auth_client.get(
+                reverse('api:report-search'),
+                {'q': 'text'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_tags(self):
+        """The tags with their counts by one query."""
+        with self.assertNumQueries(1):
+            response = self.auth_client.get(reverse('api:tag-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_tag(self):
+        """The tag with its counts by one query."""
+        with self.assertNumQueries(1):
+            response = self.auth_client.get(
+                reverse('api:tag-detail', args=(self.tag1.id,))
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_tag_reports(self):
+        """The tag, the index rows with the reports and their texts."""
+        models.ReportTag.objects.index_reports([self.report1.id])
+        with self.assertNumQueries(3):
+            response = self.auth_client.get(
+                reverse('api:tag-reports', args=(self.tag1.id,))
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_auth_root(self):
+        """The root of the djoser router makes no queries."""
+        with self.assertNumQueries(0):
+            response = self.auth_client.get(reverse('api:api-root'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('users', response.json())
+
+    def test_create_user(self):
+        """The username is checked, the user is saved in the savepoint."""
+        data = td.create_user_data('created')
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('api:user-list'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_list_users(self):
+        """Only the user itself is listed to the user, by one query."""
+        with self.assertNumQueries(1):
+            response = self.auth_client.get(reverse('api:user-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_me(self):
+        """The user is already loaded by the authentication."""
+        with self.assertNumQueries(0):
+            response = self.auth_client.get(reverse('api:user-me'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_user(self):
+        """The user by one query."""
+        url = reverse('api:user-detail', args=(self.user1.id,))
+        with self.assertNumQueries(1):
+            response = self.auth_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_set_password(self):
+        """The new password of the user is saved."""
+        data = td.create_user_data('password')
+        user = models.User.objects.create_user(**data)
+        self.auth_client.force_authenticate(user)
+        with self.assertNumQueries(1):
+            response = self.auth_client.post(
+                reverse('api:user-set-password'),
+                data={
+                    'current_password': data['password'],
+                    'new_password': 'New password 1'
+                }
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_create_jwt(self):
+        """The user is loaded to check the password."""
+        data = td.create_user_data('jwt')
+        models.User.objects.create_user(**data)
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                reverse('api:jwt-create'),
+                data={
+                    'username': data['username'],
+                    'password': data['password']
+                }
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_refresh_jwt(self):
+        """The refresh token is checked without the queries."""
+        refresh = RefreshToken.for_user(self.user1)
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                reverse('api:jwt-refresh'),
+                data={'refresh': str(refresh)}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_verify_jwt(self):
+        """The token is checked without the queries."""
+        access = RefreshToken.for_user(self.user1).access_token
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                reverse('api:jwt-verify'),
+                data={'token': str(access)}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.test import TestCase
 from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
 
 from api import serializers
+from api.cache import tag_cache
 from api.tests import utils
 from posts import models
 
@@ -50,7 +54,7 @@ class TestPostSerializer(TestCase):
         cls.tag1 = models.Tag.objects.create(**tag1_data)
         post1_data = utils.create_post_data('mixin1', cls.user1)
         cls.post1 = models.Post.objects.create(**post1_data)
-        cls.post1.tags.set([cls.tag1])
+        cls.post1.set_tags([cls.tag1])
 
     def test_contains_expected_fields(self):
         """The serializer contains all the necessary fields."""
@@ -127,6 +131,7 @@ class TestReportCreateSerializer(TestCase):
         serializer = self.report_serializer(self.report1)
         expected_fields = {
             'id',
+            'slug',
             'post',
             'expire_time'
         }
@@ -137,6 +142,11 @@ class TestReportCreateSerializer(TestCase):
         serializer = self.report_serializer(self.report1)
         self.assertEqual(serializer.data['id'], self.report1.id)
 
+    def test_slug_field_content(self):
+        """The serializer handles the instance.slug field correctly."""
+        serializer = self.report_serializer(self.report1)
+        self.assertEqual(serializer.data['slug'], self.report1.slug)
+
     def test_post_field_content(self):
         """The serializer handles the instance.post field correctly."""
         serializer = self.report_serializer(self.report1)
@@ -152,3 +162,75 @@ class TestReportCreateSerializer(TestCase):
         )
         expected_expire_time = post_created_at_aware.isoformat()
         self.assertEqual(serializer.data['expire_time'], expected_expire_time)
+
+
+class TestRowSerializer(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        user1_data = utils.create_user_data('rows')
+        cls.user1 = models.User.objects.create(**user1_data)
+        tag1 = models.Tag.objects.create(**utils.create_tag_data('rows1'))
+        tag2 = models.Tag.objects.create(**utils.create_tag_data('rows0'))
+        cls.posts = [
+            models.Post.objects.create(
+                **utils.create_post_data(f'rows{number}', cls.user1)
+            )
+            for number in range(3)
+        ]
+        cls.posts[0].set_tags([tag1, tag2])
+        cls.posts[1].text = 'Text ' * settings.BLOB_COMPRESS_MIN_SIZE
+        cls.posts[1].save()
+        for post in cls.posts[:2]:
+            report = models.Report.objects.create(
+                **utils.create_report_data(post)
+            )
+            models.Post.objects.filter(id=report.post_id).touch()
+
+    def setUp(self):
+        tag_cache.clear()
+        self.context = {'request': APIRequestFactory().get('/')}
+
+    def assert_renders_same(self, serializer_class, queryset):
+        """The rows of the columns of the serializer are rendered
+        to the same JSON as the model instances."""
+        columns = serializer_class(context=self.context).get_columns()
+        instances_data = serializer_class(
+            queryset,
+            many=True,
+            context=self.context
+        ).data
+        rows_data = serializer_class(
+            queryset.values(*dict.fromkeys(columns)),
+            many=True,
+            context=self.context
+        ).data
+        self.assertEqual(
+            JSONRenderer().render(rows_data),
+            JSONRenderer().render(instances_data)
+        )
+
+    def test_posts_are_rendered_same(self):
+        """The rows of the posts are rendered as the posts."""
+        queryset = models.Post.objects.select_related('author').order_by('id')
+        self.assert_renders_same(serializers.PostSerializer, queryset)
+        self.assert_renders_same(serializers.PostCompactSerializer, queryset)
+
+    def test_reports_are_rendered_same(self):
+        """The rows of the reports are rendered as the reports."""
+        queryset = models.Report.objects.select_related(
+            'post__author'
+        ).order_by('id')
+        self.assert_renders_same(serializers.ReportViewSerializer, queryset)
+        self.assert_renders_same(serializers.ReportCompactSerializer, queryset)
+
+    def test_sparse_fields_are_rendered_same(self):
+        """The rows of the requested fields are rendered as the fields
+        of the model instances."""
+        self.context['fields'] = {'slug', 'post.text', 'post.author'}
+        self.context['omit'] = {'post.author.email'}
+        queryset = models.Report.objects.select_related(
+            'post__author'
+        ).order_by('id')
+        self.assert_renders_same(serializers.ReportViewSerializer, queryset)
@@ -0,0 +1,178 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api import expiry, tasks
+from api.cache import get_redis
+from api.tests import utils
+from posts import models
+
+
+class TestDeleteExpiredReports(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        user1_data = utils.create_user_data('mixin1')
+        cls.user1 = models.User.objects.create(**user1_data)
+        post1_data = utils.create_post_data('mixin1', cls.user1)
+        cls.post1 = models.Post.objects.create(**post1_data)
+
+    def setUp(self):
+        cache.clear()
+        self.report = models.Report.objects.create(
+            **utils.create_report_data(self.post1)
+        )
+        self.expired_report = models.Report.objects.create(
+            post=self.post1,
+            expire_time=timezone.now() - timedelta(minutes=1)
+        )
+
+    def test_deletes_only_expired_reports(self):
+        """The task deletes the expired reports and keeps the others."""
+        tasks.delete_expired_reports()
+        self.assertTrue(
+            models.Report.objects.filter(id=self.report.id).exists()
+        )
+        self.assertFalse(
+            models.Report.objects.filter(id=self.expired_report.id).exists()
+        )
+
+    @override_settings(REPORT_EXPIRY_BATCH_SIZE=2)
+    def test_deletes_expired_reports_by_batches(self):
+        """The task deletes all the expired reports by
+        batches and reports the number of them."""
+        for _ in range(4):
+            models.Report.objects.create(
+                post=self.post1,
+                expire_time=timezone.now() - timedelta(minutes=1)
+            )
+        result = tasks.delete_expired_reports()
+        self.assertEqual(result, {'deleted': 5, 'lag': 0})
+        self.assertEqual(
+            models.Report.objects.filter(
+                expire_time__lt=timezone.now()
+            ).count(),
+            0
+        )
+
+    @override_settings(REPORT_EXPIRY_TIME_BUDGET=0)
+    def test_reports_lag_when_time_budget_is_spent(self):
+        """The task stops when the time budget is spent
+        and reports how far it is behind."""
+        result = tasks.delete_expired_reports()
+        self.assertEqual(result['deleted'], 0)
+        self.assertGreaterEqual(result['lag'], 60)
+
+    def test_drops_cache_of_expired_reports(self):
+        """The task drops the cache entries of the expired reports."""
+        cache.set(f'report_cache/{self.report.slug}', {})
+        cache.set(f'report_cache/{self.expired_report.slug}', {})
+        tasks.delete_expired_reports()
+        self.assertIsNotNone(cache.get(f'report_cache/{self.report.slug}'))
+        self.assertIsNone(
+            cache.get(f'report_cache/{self.expired_report.slug}')
+        )
+
+    def test_recounts_active_reports_of_posts(self):
+        """The post is public until the expire time
+        of its only unexpired report."""
+        models.Post.objects.filter(id=self.post1.id).update(
+            active_report_count=2
+        )
+        tasks.delete_expired_reports()
+        post = models.Post.objects.get(id=self.post1.id)
+        self.assertEqual(post.active_report_count, 1)
+        self.assertEqual(post.public_until, self.report.expire_time)
+        self.assertTrue(post.is_public)
+
+
+class TestExpireDueReports(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        user1_data = utils.create_user_data('mixin1')
+        cls.user1 = models.User.objects.create(**user1_data)
+        post1_data = utils.create_post_data('mixin1', cls.user1)
+        cls.post1 = models.Post.objects.create(**post1_data)
+
+    def setUp(self):
+        cache.clear()
+        get_redis().delete(settings.REPORT_EXPIRY_SCHEDULE_KEY)
+        self.report = models.Report.objects.create(
+            **utils.create_report_data(self.post1)
+        )
+        self.expired_report = models.Report.objects.create(
+            post=self.post1,
+            expire_time=timezone.now() - timedelta(minutes=1)
+        )
+        expiry.schedule_report_expiry([self.report, self.expired_report])
+
+    def test_deletes_only_due_reports(self):
+        """The due reports are deleted and removed from the schedule,
+        the others are kept there."""
+        self.assertEqual(tasks.expire_due_reports(), 1)
+        self.assertTrue(
+            models.Report.objects.filter(id=self.report.id).exists()
+        )
+        self.assertFalse(
+            models.Report.objects.filter(id=self.expired_report.id).exists()
+        )
+        self.assertEqual(tasks.expire_due_reports(), 0)
+        self.assertEqual(
+            expiry.pop_due_report_ids(
+                self.report.expire_time + timedelta(seconds=1),
+                10
+            ),
+            [self.report.id]
+        )
+
+    def test_due_report_is_claimed_once(self):
+        """The due report is returned to only one of the workers."""
+        now = timezone.now()
+        self.assertEqual(
+            expiry.pop_due_report_ids(now, 10),
+            [self.expired_report.id]
+        )
+        self.assertEqual(expiry.pop_due_report_ids(now, 10), [])
+
+    def test_keeps_prolonged_reports(self):
+        """The report prolonged after it was scheduled is not deleted."""
+        models.Report.objects.filter(id=self.expired_report.id).update(
+            expire_time=timezone.now() + timedelta(minutes=5)
+        )
+        tasks.expire_due_reports()
+        self.assertTrue(
+            models.Report.objects.filter(id=self.expired_report.id).exists()
+        )
+        self.assertEqual(
+            expiry.pop_due_report_ids(
+                timezone.now() + timedelta(minutes=10),
+                10
+            ),
+            [self.expired_report.id]
+        )
+
+
+class TestRecountTags(TestCase):
+    def test_drifted_counts_are_fixed(self):
+        """The counts of the tags are recounted from the posts
+        and the tag index of the reports."""
+        user = models.User.objects.create(**utils.create_user_data('tags'))
+        tag = models.Tag.objects.create(**utils.create_tag_data('tags'))
+        post = models.Post.objects.create(
+            **utils.create_post_data('tags', user)
+        )
+        post.set_tags([tag])
+        report = models.Report.objects.create(
+            **utils.create_report_data(post)
+        )
+        models.ReportTag.objects.index_reports([report.id], created=True)
+        models.Tag.objects.update(post_count=5, report_count=5)
+        tasks.recount_tags()
+        tag.refresh_from_db()
+        self.assertEqual((tag.post_count, tag.report_count), (1, 1))
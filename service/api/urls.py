@@ -6,6 +6,7 @@ from api import views
 router = DefaultRouter()
 router.register(r'posts', views.PostViewSet, basename='post')
 router.register(r'reports', views.ReportViewsSet, basename='report')
+router.register(r'tags', views.TagViewSet, basename='tag')
 
 urlpatterns = [
     path('', include(router.urls)),
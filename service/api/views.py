@@ -1,76 +1,437 @@
-from logging import Logger
+import os
+from collections import Counter
+from functools import partial
 
 from django.conf import settings
-from django.db.models.expressions import Exists, OuterRef
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    REGISTRY,
+    generate_latest,
+    multiprocess
+)
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 
+from api import pagination
 from api import permissions
 from api import serializers
-from api.mixins import CacheMixin
+from api.cache import delete_obj_caches, get_gzip_etag
+from api.expiry import schedule_report_expiry, unschedule_report_expiry
+from api.mixins import (
+    BulkCreateMixin,
+    CacheMixin,
+    SearchMixin,
+    SparseFieldsMixin,
+    get_bool_param,
+    get_validator_response,
+    set_validator_headers
+)
+from api.streaming import (
+    PlainTextRenderer,
+    RangeNotSatisfiable,
+    parse_range,
+    stream_chunks
+)
 from posts import models
+from posts.blobs import get_blob_store
+from posts.compression import GZIP, IDENTITY, accepts_gzip
 
-logger = Logger(__name__)
 
+def metrics_view(request):
+    """Exports the Prometheus metrics, collected from all the worker
+    processes if PROMETHEUS_MULTIPROC_DIR is set."""
+    registry = REGISTRY
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(
+        generate_latest(registry),
+        content_type=CONTENT_TYPE_LATEST
+    )
 
-class PostViewSet(CacheMixin):
+
+def get_seconds_until(moment):
+    """Returns the whole number of seconds left until the moment."""
+    return max(0, int((moment - timezone.now()).total_seconds()))
+
+
+def touch_posts(post_ids, author_id):
+    """Increments the version of the posts changed by their
+    reports and invalidates the posts cache entries, once more
+    after the commit, as they could be filled by other requests
+    before the change was committed."""
+    models.Post.objects.filter(id__in=post_ids).touch()
+    delete_obj_caches('post', post_ids, author_id)
+    transaction.on_commit(
+        partial(delete_obj_caches, 'post', post_ids, author_id)
+    )
+
+
+class PostViewSet(BulkCreateMixin, SearchMixin, SparseFieldsMixin, CacheMixin):
     serializer_class = serializers.PostSerializer
+    compact_serializer_class = serializers.PostCompactSerializer
     permission_classes = (permissions.IsAuthor,)
+    pagination_class = pagination.PostCursorPagination
     http_method_names = ['get', 'post', 'patch', 'delete']
     cache_base_name = 'post'
     cache_obj_lifetime = settings.CACHE_LIFETIME
+    cache_list_lifetime = settings.CACHE_LIST_LIFETIME
+    bulk_related_fields = {'tags': models.Tag.objects.all()}
 
     def get_queryset(self):
-        """Returns all the user's posts, with an annotated field "is_public",
-        which means whether there is a report with this post."""
+        """Returns all the user's posts, only the public or the private
+        ones by the "is_public" parameter of the lists, which load only
+        the rendered columns.
+        The deleted post is loaded without the related objects."""
+        if self.action == 'destroy':
+            return self.get_validator_queryset()
         queryset = models.Post.objects.select_related(
             'author'
-        ).prefetch_related(
-            'tags'
         ).filter(
             author=self.request.user
-        ).annotate(
-            is_public=Exists(
-                models.Report.objects.filter(post=OuterRef('id'))
-            )
         )
+        if self.action in self.sparse_actions:
+            is_public = get_bool_param(self.request, 'is_public')
+            if is_public is not None:
+                queryset = queryset.public(is_public)
+            queryset = self.get_sparse_queryset(queryset)
         return queryset
 
     def perform_create(self, serializer):
         """Call serializer.save() with param author=self.request.user."""
         serializer.save(author=self.request.user)
 
-    def dispatch(self, request, *args, **kwargs):
-        from django.db import connection
-        logger.info(len(connection.queries))
-        logger.info(connection.queries)
-        return super().dispatch(request, *args, **kwargs)
+    def perform_bulk_create(self, serializers):
+        """Puts the texts in the blob store and inserts the posts
+        with their search vectors and their tags by one query each,
+        the post counts of the tags are updated by their deltas."""
+        posts = []
+        for serializer in serializers:
+            data = dict(serializer.validated_data)
+            tags = data.pop('tags', [])
+            text = data.pop('text')
+            post = models.Post(
+                **data,
+                tag_ids=sorted({tag.id for tag in tags}),
+                author=self.request.user
+            )
+            post.text = text
+            post.update_search_vector()
+            posts.append(post)
+        models.Post.put_texts(posts)
+        models.Post.objects.bulk_create(posts)
+        PostTag = models.Post.tags.through
+        post_tags = PostTag.objects.bulk_create([
+            PostTag(post_id=post.id, tag_id=tag_id)
+            for post in posts
+            for tag_id in post.tag_ids
+        ])
+        models.Tag.objects.add_counts(
+            'post_count',
+            Counter(post_tag.tag_id for post_tag in post_tags)
+        )
+        for post, serializer in zip(posts, serializers):
+            serializer.instance = post
+
+    def perform_update(self, serializer):
+        """Invalidates the cache of the reports sharing the post."""
+        super().perform_update(serializer)
+        delete_obj_caches(
+            'report',
+            serializer.instance.reports.values_list('slug', flat=True)
+        )
+
+    def perform_destroy(self, instance):
+        """Uncounts the post in its tags and invalidates
+        the cache of the reports sharing the post."""
+        report_slugs = list(instance.reports.values_list('slug', flat=True))
+        instance.set_tags([])
+        super().perform_destroy(instance)
+        delete_obj_caches('report', report_slugs)
+
+    def get_cache_scope(self):
+        """The posts are cached per author."""
+        return self.request.user.id
 
+    def get_validator_queryset(self):
+        """Returns the user's posts without the text."""
+        return models.Post.objects.filter(
+            author_id=self.request.user.id
+        ).only('id', 'author', 'version', 'updated_at', 'tag_ids')
 
-class ReportViewsSet(CacheMixin):
+    def get_validators(self, instance):
+        """The ETag is derived from the version of the post."""
+        return (
+            f'"post-{instance.id}-{instance.version}"',
+            int(instance.updated_at.timestamp())
+        )
+
+    def get_cache_generation_names(self):
+        """The list of posts is cached per author."""
+        return [f'post_generation/{self.request.user.id}']
+
+    def get_invalidated_generation_names(self):
+        """A change of the post also changes the reports sharing it."""
+        return [*self.get_cache_generation_names(), 'report_generation']
+
+
+class ReportViewsSet(
+    BulkCreateMixin,
+    SearchMixin,
+    SparseFieldsMixin,
+    CacheMixin
+):
+    serializer_class = serializers.ReportViewSerializer
+    compact_serializer_class = serializers.ReportCompactSerializer
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = (permissions.IsAuthorOrReadOnly,)
+    pagination_class = pagination.ReportCursorPagination
+    lookup_field = 'slug'
+    lookup_value_regex = '[0-9A-Za-z]+'
+    search_vector_field = 'post__search_vector'
     cache_base_name = 'report'
     cache_obj_lifetime = settings.CACHE_LIFETIME
+    cache_list_lifetime = settings.CACHE_LIST_LIFETIME
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        """The list and retrieve actions are served from the cache
+        by the async view under the ASGI server."""
+        from api.async_views import get_async_read_view
+
+        view = super().as_view(actions, **initkwargs)
+        return get_async_read_view(view, actions)
 
     def get_queryset(self):
-        """Returns all reports that have not yet arrived expire time."""
+        """Returns all reports that have not yet arrived expire time,
+        the lists load only the rendered columns.
+        The deleted report is loaded without the related objects."""
+        if self.action == 'destroy':
+            return self.get_narrow_queryset()
         queryset = models.Report.objects.filter(
             expire_time__gte=timezone.now()
-        ).select_related(
-            'post__author'
-        ).prefetch_related('post__tags')
+        ).select_related('post__author')
+        if self.action in self.sparse_actions:
+            queryset = self.get_sparse_queryset(queryset)
         return queryset
 
     def get_serializer_class(self):
-        """Returns ReportViewSerializer if request method
-        is GET ReportCreateSerializer otherwise."""
+        """Returns ReportViewSerializer, or the compact one, if request
+        method is GET ReportCreateSerializer otherwise."""
         if self.request.method == 'GET':
-            return serializers.ReportViewSerializer
+            return super().get_serializer_class()
 
         return serializers.ReportCreateSerializer
 
-    def dispatch(self, request, *args, **kwargs):
-        from django.db import connection
-        logger.info(len(connection.queries))
-        logger.info(connection.queries)
-        return super().dispatch(request, *args, **kwargs)
+    def perform_create(self, serializer):
+        """The new report makes the post public."""
+        super().perform_create(serializer)
+        touch_posts([serializer.instance.post_id], self.request.user.id)
+
+    def get_bulk_related_querysets(self):
+        """The reports are created only for the user's own posts."""
+        return {
+            'post': models.Post.objects.filter(
+                author_id=self.request.user.id
+            ).only('id', 'author')
+        }
+
+    def perform_bulk_create(self, serializers):
+        """Inserts the reports by one query, indexes them by the tags
+        and makes their posts public. Their expiry is scheduled after
+        the commit, so the rolled back reports are not scheduled."""
+        slugs = models.Report.generate_unique_slugs(len(serializers))
+        reports = models.Report.objects.bulk_create([
+            models.Report(**serializer.validated_data, slug=slug)
+            for serializer, slug in zip(serializers, slugs)
+        ])
+        for report, serializer in zip(reports, serializers):
+            serializer.instance = report
+        transaction.on_commit(partial(schedule_report_expiry, reports))
+        models.ReportTag.objects.index_reports(
+            [report.id for report in reports],
+            created=True
+        )
+        touch_posts(
+            list({report.post_id for report in reports}),
+            self.request.user.id
+        )
+
+    def perform_update(self, serializer):
+        """The report may be moved to another post."""
+        post_id = serializer.instance.post_id
+        super().perform_update(serializer)
+        touch_posts(
+            list({post_id, serializer.instance.post_id}),
+            self.request.user.id
+        )
+
+    def perform_destroy(self, instance):
+        """The deleted report may make the post private."""
+        report_id = instance.id
+        models.ReportTag.objects.unindex_reports([report_id])
+        super().perform_destroy(instance)
+        unschedule_report_expiry([report_id])
+        touch_posts([instance.post_id], self.request.user.id)
+
+    def get_narrow_queryset(self, *fields):
+        """Returns the reports that have not yet arrived expire
+        time loading only the validators and the given fields."""
+        return models.Report.objects.filter(
+            expire_time__gte=timezone.now()
+        ).select_related('post').only(
+            'id',
+            'slug',
+            'updated_at',
+            'post__author',
+            'post__version',
+            'post__updated_at',
+            *fields
+        )
+
+    def get_validator_queryset(self):
+        """Returns the reports that have not yet arrived
+        expire time without the text of the post."""
+        return self.get_narrow_queryset()
+
+    @action(
+        detail=True,
+        methods=['get'],
+        renderer_classes=[JSONRenderer, PlainTextRenderer]
+    )
+    def raw(self, request, slug=None):
+        """Streams the text of the reported post as plain text by chunks,
+        the single byte range of the Range header is supported. The
+        gzipped text is sent as is to the clients accepting gzip."""
+        report = get_object_or_404(
+            self.get_narrow_queryset('post__text_digest', 'post__text_size'),
+            slug=slug
+        )
+        self.check_object_permissions(request, report)
+        etag, last_modified = self.get_validators(report)
+        etag = f'{etag[:-1]}-raw"'
+        not_modified = get_validator_response(
+            request,
+            etag,
+            last_modified,
+            gzip='HTTP_RANGE' not in request.META
+        )
+        if not_modified is not None:
+            return not_modified
+        size = report.post.text_size
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if range_header and (if_range is None or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(
+                    status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+                )
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+        encoding, raw_file = get_blob_store().open(report.post.text_digest)
+        if byte_range is None and encoding == GZIP and accepts_gzip(request):
+            raw_file.seek(0, os.SEEK_END)
+            compressed_size = raw_file.tell()
+            response = StreamingHttpResponse(
+                stream_chunks(
+                    request,
+                    IDENTITY,
+                    raw_file,
+                    0,
+                    compressed_size,
+                    settings.RAW_CHUNK_SIZE
+                ),
+                content_type='text/plain; charset=utf-8'
+            )
+            response['Content-Encoding'] = GZIP
+            response['Content-Length'] = compressed_size
+            etag = get_gzip_etag(etag)
+        else:
+            start, end = byte_range or (0, size - 1)
+            response = StreamingHttpResponse(
+                stream_chunks(
+                    request,
+                    encoding,
+                    raw_file,
+                    start,
+                    end - start + 1,
+                    settings.RAW_CHUNK_SIZE
+                ),
+                content_type='text/plain; charset=utf-8'
+            )
+            response['Content-Length'] = end - start + 1
+            if byte_range is not None:
+                response.status_code = status.HTTP_206_PARTIAL_CONTENT
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return set_validator_headers(response, etag, last_modified)
+
+    def get_validators(self, instance):
+        """The ETag is derived from the modification time
+        of the report and the version of its post."""
+        return (
+            f'"report-{instance.id}-{instance.updated_at.timestamp()}'
+            f'-{instance.post.version}"',
+            int(max(instance.updated_at, instance.post.updated_at).timestamp())
+        )
+
+    def get_cache_max_lifetime(self, instance):
+        """The report is not served from the cache after its expire time."""
+        return get_seconds_until(instance.expire_time)
+
+    def get_list_cache_lifetime(self, list_data):
+        """The page is not served from the cache after the expire
+        time of its first report, which is the soonest to expire.
+        It is taken from the rows of the paginator, as it may be
+        left out of the rendered fields."""
+        if not self.paginator.page:
+            return self.cache_list_lifetime
+        return min(
+            self.cache_list_lifetime,
+            get_seconds_until(self.paginator.page[0]['expire_time'])
+        )
+
+    def get_invalidated_generation_names(self):
+        """A change of the report also changes the is_public
+        field in the list of the author's posts."""
+        return [
+            *self.get_cache_generation_names(),
+            f'post_generation/{self.request.user.id}'
+        ]
+
+
+class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = models.Tag.objects.all()
+    permission_classes = (IsAuthenticated,)
+    serializer_class = serializers.TagSerializer
+    pagination_class = pagination.TagCursorPagination
+
+    @action(detail=True, methods=['get'])
+    def reports(self, request, pk=None):
+        """Returns the page of the unexpired reports of the posts with
+        the tag, read by the index scan of the denormalized tag index."""
+        tag = self.get_object()
+        queryset = models.ReportTag.objects.filter(
+            tag_id=tag.id,
+            expire_time__gte=timezone.now()
+        ).select_related('report__post__author')
+        paginator = pagination.ReportTagCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = serializers.ReportViewSerializer(
+            [report_tag.report for report_tag in page],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
@@ -0,0 +1,109 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+REPLICA_LAG_SQL = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+            OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+        THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+'''
+
+replica_reads = ContextVar('replica_reads', default=False)
+_replica_lags = {}
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """Sends the reads of the block to the replicas if enabled."""
+    token = replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def get_pin_names(keys):
+    """Returns the cache names of the primary pins of the keys."""
+    return [f'primary_pin/{key}' for key in keys]
+
+
+def pin_primary(keys):
+    """Sends the reads of the keys to the primary for the
+    REPLICA_PIN_LIFETIME, while the replicas catch up the write."""
+    if settings.DATABASE_REPLICAS:
+        cache.set_many(
+            dict.fromkeys(get_pin_names(keys), 1),
+            settings.REPLICA_PIN_LIFETIME
+        )
+
+
+def is_pinned(keys):
+    """Returns True if some of the keys are pinned to the primary."""
+    if not settings.DATABASE_REPLICAS:
+        return False
+    return bool(cache.get_many(get_pin_names(keys)))
+
+
+def check_replica_lag(alias):
+    """Returns the replication lag of the replica in seconds,
+    or None if the replica is unavailable."""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        return None
+
+
+def get_replica_lag(alias):
+    """Returns the replication lag of the replica checked
+    at most once in REPLICA_LAG_CHECK_INTERVAL by the process."""
+    checked_at, lag = _replica_lags.get(alias, (None, None))
+    now = time.monotonic()
+    if (
+        checked_at is None
+        or now - checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL
+    ):
+        lag = check_replica_lag(alias)
+        _replica_lags[alias] = (now, lag)
+    return lag
+
+
+def get_replica():
+    """Returns the random replica lagging behind the primary less
+    than REPLICA_MAX_LAG, or the primary if there is none."""
+    replicas = []
+    for alias in settings.DATABASE_REPLICAS:
+        lag = get_replica_lag(alias)
+        if lag is not None and lag <= settings.REPLICA_MAX_LAG:
+            replicas.append(alias)
+    if not replicas:
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+class ReplicaRouter:
+    """Routes the reads of the use_replicas() blocks to the replicas,
+    all the other queries go to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and settings.DATABASE_REPLICAS:
+            return get_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -13,9 +13,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', 'random_string')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DJANGO_DEBUG', 'False') == 'True'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = os.getenv(
+    'DJANGO_ALLOWED_HOSTS',
+    'localhost,127.0.0.1,[::1],web-app'
+).split(',')
 
 
 # Application definition
@@ -27,6 +30,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'api.apps.ApiConfig',
     'posts.apps.PostsConfig',
     'rest_framework',
@@ -34,6 +38,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,10 +79,43 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # The connections are kept by the sync workers between
+        # the requests and checked before the reuse. The ASGI requests
+        # run in their own threads and never reuse the connections,
+        # so the web app connects through pgbouncer with 0 here.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', 'True'
+        ) == 'True',
+        # The named cursors of QuerySet.iterator() do not survive
+        # the transaction pooling of pgbouncer. psycopg2 uses no server
+        # side prepared statements, so nothing else is to be disabled.
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', 'False'
+        ) == 'True',
     }
 }
 
+# The replicas of the DB_REPLICA_HOSTS serve the safe reads
+# of the cached lists and instances, see app.db_routers.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))
+):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'}
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['app.db_routers.ReplicaRouter']
+REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 1))
+REPLICA_LAG_CHECK_INTERVAL = 1
+REPLICA_PIN_LIFETIME = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -163,10 +201,22 @@ SIMPLE_JWT = {
 CELERY_BROKER_URL = 'redis://redis:6379/0'
 CELERY_TIMEZONE = 'Europe/Moscow'
 
+REPORT_EXPIRY_INTERVAL = 60 * 60 * 24
+REPORT_EXPIRY_SCHEDULE_KEY = 'report_expiry_schedule'
+REPORT_EXPIRY_POLL_INTERVAL = 1
+
+REPORT_SLUG_LENGTH = 8
+
+BULK_CREATE_MAX_SIZE = 500
+REPORT_EXPIRY_BATCH_SIZE = int(os.getenv('REPORT_EXPIRY_BATCH_SIZE', 500))
+REPORT_EXPIRY_TIME_BUDGET = 30
+
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379')
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': 'redis://redis:6379',
+        'LOCATION': REDIS_URL,
         'OPTIONS': {
             'db': '1'
         }
@@ -174,3 +224,33 @@ CACHES = {
 }
 
 CACHE_LIFETIME = 60 * 20
+CACHE_LIST_LIFETIME = 60
+CACHE_STALE_LIFETIME = 60
+CACHE_JITTER = 0.1
+CACHE_LOCK_TIMEOUT = 5
+CACHE_LOCK_POLL_INTERVAL = 0.05
+CACHE_COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 6
+
+BLOB_STORE_BACKEND = os.getenv(
+    'BLOB_STORE_BACKEND',
+    'posts.blobs.DatabaseBlobStore'
+)
+BLOB_STORE_ROOT = os.getenv('BLOB_STORE_ROOT', BASE_DIR / 'blobs')
+BLOB_GC_GRACE_PERIOD = 60 * 60
+BLOB_COMPRESS_MIN_SIZE = 4096
+RAW_CHUNK_SIZE = 64 * 1024
+
+LOCAL_CACHE_ENABLED = os.getenv('LOCAL_CACHE_ENABLED', 'False') == 'True'
+LOCAL_CACHE_MAX_ENTRIES = 1000
+LOCAL_CACHE_MAX_BYTES = 1024 * 1024 * 32
+LOCAL_CACHE_LIFETIME = 5
+LOCAL_CACHE_CHANNEL = 'local_cache_invalidation'
+TAG_CACHE_KEY = 'tag_cache'
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+TEXT_PREVIEW_LENGTH = 200
+
+SEARCH_CONFIG = 'english'
+SEARCH_TEXT_MAX_LENGTH = 100 * 1024
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from api.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/v1/', include(('api.urls', 'api'), namespace='api'))
+    path('api/v1/', include(('api.urls', 'api'), namespace='api')),
+    path('metrics', metrics_view, name='metrics')
 ]
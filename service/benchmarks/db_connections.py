@@ -0,0 +1,82 @@
+"""Latency test of the requests making one cheap query each.
+
+The readers request the cached report, which is served by the one
+query of the JWT user, so the connection setup makes a large part
+of the latency if the connection is opened for each request.
+Run the test against the sync workers without and with
+the persistent connections:
+
+    DB_CONN_MAX_AGE=0 gunicorn --workers 2 app.wsgi
+    DB_CONN_MAX_AGE=60 gunicorn --workers 2 app.wsgi
+
+    python benchmarks/db_connections.py --token <JWT> --slug <slug>
+
+The ASGI workers open the connection for each request anyway,
+run them with DB_PORT of pgbouncer to compare the pooled connections.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def request(host, port, path, token):
+    """Makes the GET request and returns the status of the response."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(
+        f'GET {path} HTTP/1.1\r\n'
+        f'Host: {host}\r\n'
+        f'Authorization: Bearer {token}\r\n'
+        f'Accept: application/json\r\n'
+        f'Connection: close\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def reader(args, host, port, latencies, errors):
+    path = f'/api/v1/reports/{args.slug}/'
+    for _ in range(args.requests):
+        start = time.monotonic()
+        try:
+            status = await request(host, port, path, args.token)
+        except OSError:
+            status = None
+        if status == 200:
+            latencies.append(time.monotonic() - start)
+        else:
+            errors.append(status)
+
+
+async def main(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    latencies, errors = [], []
+    start = time.monotonic()
+    await asyncio.gather(*[
+        reader(args, host, port, latencies, errors)
+        for _ in range(args.readers)
+    ])
+    duration = time.monotonic() - start
+    print(f'requests: {len(latencies)}, failed: {len(errors)}')
+    print(f'throughput: {len(latencies) / duration:.1f} req/s')
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f'latency p50: {quantiles[49] * 1000:.1f} ms, '
+            f'p99: {quantiles[98] * 1000:.1f} ms'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--token', required=True)
+    parser.add_argument('--slug', required=True)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+"""Load test of the report read path under many slow readers.
+
+The slow readers download the raw text of a large report, reading it
+by small pieces with a pause, as the clients on the bad network do.
+Meanwhile the fast readers request the cached report as often as
+they can, and their latency and throughput are reported.
+
+The synchronous WSGI workers are held by the slow readers for the
+whole download, while the ASGI worker streams the text asynchronously.
+Run the test against both servers with the same number of workers:
+
+    gunicorn --workers 2 app.wsgi
+    gunicorn --workers 2 --worker-class uvicorn.workers.UvicornWorker \\
+        app.asgi:application
+
+    python benchmarks/report_readers.py --token <JWT> --slug <slug> \\
+        --fast-slug <slug>
+
+The report of the slow readers should be large enough not to fit
+in the socket buffers, a few megabytes are enough, the fast readers
+may request another, small report given by --fast-slug.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def request(host, port, path, token, read_size=None, read_delay=0):
+    """Makes the GET request and reads the response by the pieces
+    of read_size with read_delay between them, returns the status
+    and the number of the bytes read."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(
+        f'GET {path} HTTP/1.1\r\n'
+        f'Host: {host}\r\n'
+        f'Authorization: Bearer {token}\r\n'
+        f'Accept: application/json, text/plain\r\n'
+        f'Connection: close\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    size = 0
+    while True:
+        chunk = await reader.read(read_size or 64 * 1024)
+        if not chunk:
+            break
+        size += len(chunk)
+        if read_delay:
+            await asyncio.sleep(read_delay)
+    writer.close()
+    return int(status_line.split()[1]), size
+
+
+async def slow_reader(args, host, port):
+    path = f'/api/v1/reports/{args.slug}/raw/'
+    try:
+        status, _ = await request(
+            host,
+            port,
+            path,
+            args.token,
+            args.read_size,
+            args.read_delay
+        )
+    except OSError:
+        return False
+    return status == 200
+
+
+async def fast_reader(args, host, port, deadline, latencies, errors):
+    path = f'/api/v1/reports/{args.fast_slug or args.slug}/'
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        try:
+            status, _ = await asyncio.wait_for(
+                request(host, port, path, args.token),
+                args.timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            status = None
+        if status == 200:
+            latencies.append(time.monotonic() - start)
+        else:
+            errors.append(status)
+
+
+async def main(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    slow_readers = [
+        asyncio.create_task(slow_reader(args, host, port))
+        for _ in range(args.slow_readers)
+    ]
+    await asyncio.sleep(1)
+    latencies, errors = [], []
+    deadline = time.monotonic() + args.duration
+    await asyncio.gather(*[
+        fast_reader(args, host, port, deadline, latencies, errors)
+        for _ in range(args.fast_readers)
+    ])
+    done = [task.result() for task in slow_readers if task.done()]
+    for task in slow_readers:
+        task.cancel()
+    print(f'slow readers: {args.slow_readers}, finished: {sum(done)}')
+    print(f'fast requests: {len(latencies)}, failed: {len(errors)}')
+    print(f'throughput: {len(latencies) / args.duration:.1f} req/s')
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f'latency p50: {quantiles[49] * 1000:.1f} ms, '
+            f'p99: {quantiles[98] * 1000:.1f} ms'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--token', required=True)
+    parser.add_argument('--slug', required=True)
+    parser.add_argument('--fast-slug')
+    parser.add_argument('--slow-readers', type=int, default=200)
+    parser.add_argument('--read-size', type=int, default=4096)
+    parser.add_argument('--read-delay', type=float, default=0.1)
+    parser.add_argument('--fast-readers', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,160 @@
+"""Benchmark of the full-text search over many posts.
+
+The posts of random words are inserted by the database itself,
+their search vectors are computed by the same weights as on save,
+and all of them share one text in the blob store. Then the search
+queries of the search action are timed using the GIN index and
+by the sequential scan of the posts:
+
+    python benchmarks/search.py --posts 1000000
+
+The posts are kept between the runs, --cleanup deletes them.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.postgres.search import (  # noqa: E402
+    SearchQuery,
+    SearchRank
+)
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import F  # noqa: E402
+
+from posts import models  # noqa: E402
+
+BENCH_USERNAME = 'search_bench'
+BENCH_TEXT = 'The text of the search benchmark post'
+INSERT_SQL = '''
+    INSERT INTO posts_post (
+        title, text_digest, text_size, created_at, updated_at,
+        version, author_id, search_vector
+    )
+    SELECT
+        title, %(digest)s, %(size)s, now(), now(), 1, %(author_id)s,
+        setweight(to_tsvector(%(config)s, title), 'A')
+        || setweight(to_tsvector(%(config)s, body), 'B')
+    FROM generate_series(1, %(count)s) AS post_number,
+    LATERAL (
+        SELECT
+            'word' || (post_number %% %(words)s) AS title,
+            string_agg(
+                'word' || floor(random() * %(words)s)::int, ' '
+            ) AS body
+        FROM generate_series(1, %(body_words)s)
+        WHERE post_number > 0
+    ) AS words
+'''
+
+
+def insert_posts(author, count, words, body_words, batch_size):
+    """Inserts the posts by batches, prints the progress."""
+    post = models.Post(title='', author=author)
+    post.text = BENCH_TEXT
+    models.Post.put_texts([post])
+    inserted = 0
+    while inserted < count:
+        batch = min(batch_size, count - inserted)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(INSERT_SQL, {
+                'digest': post.text_digest,
+                'size': post.text_size,
+                'author_id': author.id,
+                'config': settings.SEARCH_CONFIG,
+                'count': batch,
+                'words': words,
+                'body_words': body_words
+            })
+        inserted += batch
+        print(f'inserted {inserted} of {count} posts')
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE posts_post')
+
+
+def search(author, query_text):
+    """Runs the queries of the search action: the count and the page."""
+    query = SearchQuery(
+        query_text,
+        config=settings.SEARCH_CONFIG,
+        search_type='websearch'
+    )
+    queryset = models.Post.objects.filter(
+        author=author,
+        search_vector=query
+    ).annotate(
+        search_rank=SearchRank(F('search_vector'), query)
+    ).order_by('-search_rank', '-id')
+    count = queryset.count()
+    list(queryset.values_list('id', flat=True)[:settings.PAGE_SIZE])
+    return count
+
+
+def time_search(author, query_text, repeat, use_index):
+    """Returns the number of the results and the search timings."""
+    timings = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not use_index:
+            cursor.execute('SET LOCAL enable_bitmapscan = off')
+            cursor.execute('SET LOCAL enable_indexscan = off')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = search(author, query_text)
+            timings.append(time.perf_counter() - start)
+    return count, timings
+
+
+def main(args):
+    author, _ = models.User.objects.get_or_create(username=BENCH_USERNAME)
+    if args.cleanup:
+        deleted, _ = models.Post.objects.filter(author=author).delete()
+        print(f'deleted {deleted} objects')
+        return
+    existing = models.Post.objects.filter(author=author).count()
+    if existing < args.posts:
+        insert_posts(
+            author,
+            args.posts - existing,
+            args.words,
+            args.body_words,
+            args.batch_size
+        )
+    for query_text in args.queries:
+        for use_index in (True, False):
+            count, timings = time_search(
+                author,
+                query_text,
+                args.repeat,
+                use_index
+            )
+            print(
+                f'{"gin index" if use_index else "seq scan"} '
+                f'"{query_text}": {count} results, '
+                f'median {statistics.median(timings) * 1000:.1f} ms'
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--words', type=int, default=10000)
+    parser.add_argument('--body-words', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--queries',
+        nargs='+',
+        default=['word42', 'word42 word43', '"word7 word8"']
+    )
+    parser.add_argument('--cleanup', action='store_true')
+    main(parser.parse_args())
@@ -0,0 +1,131 @@
+"""Benchmark of the read serializers of the lists.
+
+The page of the posts and the page of the reports are loaded and
+serialized by the model serializers from the model instances and
+by the row serializers from the .values() rows, as in the lists:
+
+    python benchmarks/serializers.py --rows 1000
+
+The posts and the reports are kept between the runs, --cleanup
+deletes them.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from api import serializers  # noqa: E402
+from posts import models  # noqa: E402
+
+BENCH_USERNAME = 'serializers_bench'
+BENCH_TAG_COUNT = 3
+
+
+def create_reports(author, count):
+    """Creates the posts with the tags and a report of each."""
+    tags = [
+        models.Tag.objects.get_or_create(
+            name=f'serializers_bench_{number}',
+            defaults={'description': 'Tag of the serializers benchmark'}
+        )[0]
+        for number in range(BENCH_TAG_COUNT)
+    ]
+    posts = []
+    for number in range(count):
+        post = models.Post(
+            title=f'Post {number}',
+            author=author,
+            tag_ids=sorted(tag.id for tag in tags)
+        )
+        post.text = f'The text of the serializers benchmark post {number}'
+        post.update_search_vector()
+        posts.append(post)
+    models.Post.put_texts(posts)
+    models.Post.objects.bulk_create(posts)
+    PostTag = models.Post.tags.through
+    PostTag.objects.bulk_create([
+        PostTag(post_id=post.id, tag_id=tag.id)
+        for post in posts
+        for tag in tags
+    ])
+    slugs = models.Report.generate_unique_slugs(count)
+    models.Report.objects.bulk_create([
+        models.Report(
+            post=post,
+            slug=slug,
+            expire_time=timezone.now() + timedelta(days=365)
+        )
+        for post, slug in zip(posts, slugs)
+    ])
+    models.Post.objects.filter(author=author).touch()
+
+
+def time_serializer(serializer_class, queryset, use_rows, repeat):
+    """Returns the timings of loading and serializing the page."""
+    context = {'request': APIRequestFactory().get('/')}
+    columns = serializer_class(context=context).get_columns()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = queryset.all()
+        if use_rows:
+            items = items.values(*dict.fromkeys(columns))
+        serializer_class(list(items), many=True, context=context).data
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(args):
+    author, _ = models.User.objects.get_or_create(username=BENCH_USERNAME)
+    if args.cleanup:
+        deleted, _ = models.Post.objects.filter(author=author).delete()
+        print(f'deleted {deleted} objects')
+        return
+    existing = models.Post.objects.filter(author=author).count()
+    if existing < args.rows:
+        create_reports(author, args.rows - existing)
+    querysets = {
+        serializers.PostSerializer: models.Post.objects.filter(
+            author=author
+        ).select_related('author').order_by('-created_at', '-id'),
+        serializers.ReportViewSerializer: models.Report.objects.filter(
+            post__author=author
+        ).select_related('post__author').order_by('expire_time', 'id'),
+    }
+    for serializer_class, queryset in querysets.items():
+        queryset = queryset[:args.rows]
+        for use_rows in (False, True):
+            timings = time_serializer(
+                serializer_class,
+                queryset,
+                use_rows,
+                args.repeat
+            )
+            median = statistics.median(timings)
+            print(
+                f'{serializer_class.__name__} '
+                f'{"rows" if use_rows else "instances"}: '
+                f'median {median * 1000:.1f} ms, '
+                f'{args.rows / median:.0f} rows/s'
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cleanup', action='store_true')
+    main(parser.parse_args())
@@ -1,16 +1,45 @@
+from django import forms
 from django.contrib import admin
 
 from posts import models
 
 
+class PostAdminForm(forms.ModelForm):
+    """Form for the post with the text kept in the blob store."""
+
+    text = forms.CharField(widget=forms.Textarea)
+
+    class Meta:
+        model = models.Post
+        exclude = ('text_digest', 'text_size', 'version')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.initial['text'] = self.instance.text
+
+    def save(self, commit=True):
+        self.instance.text = self.cleaned_data['text']
+        return super().save(commit)
+
+
 @admin.register(models.Post)
 class PostAdmin(admin.ModelAdmin):
+    form = PostAdminForm
     list_select_related = ('author',)
 
+    def save_related(self, request, form, formsets, change):
+        """The tags are set with their counts and the tag_ids copy
+        instead of the plain save of the many-to-many field."""
+        form.instance.set_tags(form.cleaned_data['tags'])
+        for formset in formsets:
+            self.save_formset(request, form, formset, change=change)
+
 
 @admin.register(models.Tag)
 class TagAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('name', 'post_count', 'report_count')
+    readonly_fields = ('post_count', 'report_count')
 
 
 @admin.register(models.Report)
@@ -0,0 +1,195 @@
+import io
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from functools import lru_cache
+from hashlib import sha256
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from posts.compression import GZIP, IDENTITY, compress, decompress
+
+ORPHANS_BATCH_SIZE = 1000
+
+
+def get_digest(data):
+    """Returns the SHA-256 hex digest addressing the data."""
+    return sha256(data).hexdigest()
+
+
+class BaseBlobStore(ABC):
+    """The content-addressed store of the paste bodies,
+    the identical bodies are stored once. The digest addresses
+    the original data, which is stored compressed if it is large."""
+
+    def put(self, data):
+        """Stores the data and returns its digest."""
+        digest = get_digest(data)
+        self.put_many({
+            digest: compress(data, settings.BLOB_COMPRESS_MIN_SIZE)
+        })
+        return digest
+
+    @abstractmethod
+    def put_many(self, blobs):
+        """Stores the dict of the (encoding, data) by their digests."""
+
+    def get(self, digest):
+        """Returns the original data of the digest."""
+        return decompress(*self.get_many([digest])[digest])
+
+    @abstractmethod
+    def get_many(self, digests):
+        """Returns the dict of the stored (encoding, data)
+        by their digests, the data is not decompressed."""
+
+    def open(self, digest):
+        """Returns the encoding and the binary file object
+        of the stored data, the data is not decompressed."""
+        encoding, data = self.get_many([digest])[digest]
+        return encoding, io.BytesIO(data)
+
+    @abstractmethod
+    def delete_orphans(self, used_digests, grace_period):
+        """Deletes the blobs older than the grace period, which are
+        not in the used_digests queryset, and returns their number."""
+
+
+class DatabaseBlobStore(BaseBlobStore):
+    """Stores the blobs in the posts.Blob table."""
+
+    def put_many(self, blobs):
+        """The creation time of the reused blobs is refreshed, so that
+        the old orphan blobs are not deleted under the new posts."""
+        from posts.models import Blob
+
+        Blob.objects.bulk_create(
+            [
+                Blob(digest=digest, encoding=encoding, data=data)
+                for digest, (encoding, data) in blobs.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['digest'],
+            update_fields=['created_at']
+        )
+
+    def get_many(self, digests):
+        from posts.models import Blob
+
+        return {
+            digest: (encoding, bytes(data))
+            for digest, encoding, data in Blob.objects.filter(
+                digest__in=digests
+            ).values_list('digest', 'encoding', 'data')
+        }
+
+    def delete_orphans(self, used_digests, grace_period):
+        from posts.models import Blob
+
+        deleted, _ = Blob.objects.filter(
+            created_at__lt=timezone.now() - timedelta(seconds=grace_period)
+        ).exclude(digest__in=used_digests).delete()
+        return deleted
+
+
+class FileSystemBlobStore(BaseBlobStore):
+    """Stores the blobs as files named by their digests
+    under the BLOB_STORE_ROOT directory."""
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.BLOB_STORE_ROOT)
+
+    def get_path(self, digest, encoding=None):
+        """Returns the path of the blob, fanned out by the first
+        bytes of the digest, the gzipped blob has the .gz suffix."""
+        path = self.root / digest[:2] / digest[2:4] / digest
+        if encoding == GZIP:
+            return path.with_suffix('.gz')
+        return path
+
+    def touch(self, digest):
+        """Refreshes the modification time of the stored blob and
+        returns True, or returns False if it is missing."""
+        for path in (self.get_path(digest, GZIP), self.get_path(digest)):
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+            return True
+        return False
+
+    def put_many(self, blobs):
+        """The modification time of the reused blobs is refreshed, so
+        that the old orphan blobs are not deleted under the new posts."""
+        for digest, (encoding, data) in blobs.items():
+            if self.touch(digest):
+                continue
+            path = self.get_path(digest, encoding)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+
+    def get_many(self, digests):
+        blobs = {}
+        for digest in digests:
+            gzip_path = self.get_path(digest, GZIP)
+            if gzip_path.exists():
+                blobs[digest] = (GZIP, gzip_path.read_bytes())
+            else:
+                blobs[digest] = (IDENTITY, self.get_path(digest).read_bytes())
+        return blobs
+
+    def open(self, digest):
+        gzip_path = self.get_path(digest, GZIP)
+        if gzip_path.exists():
+            return GZIP, gzip_path.open('rb')
+        return IDENTITY, self.get_path(digest).open('rb')
+
+    @staticmethod
+    def is_older(path, created_before):
+        """Returns True if the file exists and is not modified since
+        the created_before timestamp."""
+        try:
+            return path.stat().st_mtime < created_before
+        except FileNotFoundError:
+            return False
+
+    def delete_orphans(self, used_digests, grace_period):
+        """The old files are checked against the used digests
+        by one query per batch."""
+        deleted = 0
+        created_before = time.time() - grace_period
+        old_paths = (
+            path for path in self.root.glob('*/*/*')
+            if self.is_older(path, created_before)
+        )
+        while True:
+            batch = list(islice(old_paths, ORPHANS_BATCH_SIZE))
+            if not batch:
+                return deleted
+            used = set(
+                used_digests.filter(
+                    text_digest__in={path.stem for path in batch}
+                ).values_list('text_digest', flat=True)
+            )
+            for path in batch:
+                if path.stem not in used and self.is_older(
+                    path,
+                    created_before
+                ):
+                    path.unlink(missing_ok=True)
+                    deleted += 1
+
+
+@lru_cache
+def get_blob_store():
+    """Returns the blob store of the BLOB_STORE_BACKEND setting."""
+    return import_string(settings.BLOB_STORE_BACKEND)()
@@ -0,0 +1,40 @@
+import gzip
+
+from django.conf import settings
+
+GZIP = 'gzip'
+IDENTITY = 'identity'
+
+
+def compress(data, min_size):
+    """Returns the encoding and the data gzipped, if the data is not
+    shorter than min_size and compressing really makes it shorter.
+    The gzip format is used so that the compressed data may be sent
+    to the clients accepting it as is."""
+    if len(data) < min_size:
+        return IDENTITY, data
+    compressed = gzip.compress(
+        data,
+        compresslevel=settings.COMPRESS_LEVEL,
+        mtime=0
+    )
+    if len(compressed) >= len(data):
+        return IDENTITY, data
+    return GZIP, compressed
+
+
+def decompress(encoding, data):
+    """Returns the data decoded from the encoding."""
+    if encoding == GZIP:
+        return gzip.decompress(data)
+    return data
+
+
+def accepts_gzip(request):
+    """Returns True if the client accepts the gzipped response."""
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    return any(
+        coding.split(';')[0].strip() == GZIP
+        and coding.replace(' ', '').split(';')[-1] != 'q=0'
+        for coding in accept_encoding.split(',')
+    )
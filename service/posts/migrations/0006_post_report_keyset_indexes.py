@@ -0,0 +1,26 @@
+# Generated by Django 4.2.6 on 2026-10-18 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_alter_report_expire_time'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='report',
+            name='expire_time',
+            field=models.DateTimeField(verbose_name='when the post will no longer be available'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='post_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['expire_time', 'id'], name='report_expire_time_id_idx'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.6 on 2026-10-18 20:05
+
+from hashlib import sha256
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def iter_batches(queryset):
+    """Yields the lists of the objects of the queryset by batches."""
+    batch = []
+    for obj in queryset.iterator(chunk_size=BATCH_SIZE):
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def move_texts_to_blob_store(apps, schema_editor):
+    """Puts the texts of the posts in the blobs table and saves their
+    digests, by the models of this migration, so that it does not
+    depend on the later state of the blob store."""
+    Blob = apps.get_model('posts', 'Blob')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('id', 'text').order_by('id')
+    for batch in iter_batches(posts):
+        blobs = {}
+        for post in batch:
+            data = post.text.encode()
+            post.text_digest = sha256(data).hexdigest()
+            blobs[post.text_digest] = data
+        Blob.objects.bulk_create(
+            [Blob(digest=digest, data=data) for digest, data in blobs.items()],
+            ignore_conflicts=True
+        )
+        Post.objects.bulk_update(batch, ['text_digest'])
+
+
+def restore_texts_from_blob_store(apps, schema_editor):
+    """Restores the texts of the posts from the blobs table."""
+    Blob = apps.get_model('posts', 'Blob')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('id', 'text_digest').order_by('id')
+    for batch in iter_batches(posts):
+        blobs = dict(
+            Blob.objects.filter(
+                digest__in={post.text_digest for post in batch}
+            ).values_list('digest', 'data')
+        )
+        for post in batch:
+            post.text = bytes(blobs[post.text_digest]).decode()
+        Post.objects.bulk_update(batch, ['text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_version_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256 digest of the data')),
+                ('data', models.BinaryField(verbose_name='data of the blob')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='blob creation date')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_digest',
+            field=models.CharField(db_index=True, default='', max_length=64, verbose_name='digest of the text in the blob store'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='text',
+            field=models.TextField(default='', verbose_name='text of the post'),
+        ),
+        migrations.RunPython(
+            move_texts_to_blob_store,
+            restore_texts_from_blob_store
+        ),
+        migrations.RemoveField(
+            model_name='post',
+            name='text',
+        ),
+    ]
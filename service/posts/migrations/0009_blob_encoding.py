@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_move_post_text_to_blob_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='encoding',
+            field=models.CharField(default='identity', max_length=16, verbose_name='encoding of the data'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.6 on 2026-10-18 20:50
+
+import gzip
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def iter_batches(queryset):
+    """Yields the lists of the objects of the queryset by batches."""
+    batch = []
+    for obj in queryset.iterator(chunk_size=BATCH_SIZE):
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def set_text_sizes(apps, schema_editor):
+    """Sets the sizes of the texts already in the blobs table by
+    batches, by the models of this migration."""
+    Blob = apps.get_model('posts', 'Blob')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('id', 'text_digest').order_by('id')
+    for batch in iter_batches(posts):
+        sizes = {}
+        for digest, encoding, data in Blob.objects.filter(
+            digest__in={post.text_digest for post in batch}
+        ).values_list('digest', 'encoding', 'data'):
+            data = bytes(data)
+            if encoding == 'gzip':
+                data = gzip.decompress(data)
+            sizes[digest] = len(data)
+        for post in batch:
+            post.text_size = sizes.get(post.text_digest, 0)
+        Post.objects.bulk_update(batch, ['text_size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_blob_encoding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='text_size',
+            field=models.PositiveIntegerField(default=0, verbose_name='size of the text in bytes'),
+        ),
+        migrations.RunPython(set_text_sizes, migrations.RunPython.noop),
+    ]
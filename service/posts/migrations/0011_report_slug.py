@@ -0,0 +1,36 @@
+# Generated by Django 4.2.6 on 2026-10-18 21:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_report_slugs(apps, schema_editor):
+    """Assigns the random unique slugs to the existing reports."""
+    from posts.slugs import generate_slug
+
+    Report = apps.get_model('posts', 'Report')
+    slugs = set()
+    reports = Report.objects.only('id').order_by('id')
+    for report in reports.iterator(chunk_size=1000):
+        slug = generate_slug(settings.REPORT_SLUG_LENGTH)
+        while slug in slugs:
+            slug = generate_slug(settings.REPORT_SLUG_LENGTH)
+        slugs.add(slug)
+        report.slug = slug
+        report.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_text_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='slug',
+            field=models.CharField(editable=False, max_length=16, null=True, verbose_name='short shareable address of the report'),
+        ),
+        migrations.RunPython(set_report_slugs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_report_slug'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='report',
+            name='slug',
+            field=models.CharField(editable=False, max_length=16, unique=True, verbose_name='short shareable address of the report'),
+        ),
+    ]
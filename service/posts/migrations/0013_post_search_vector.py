@@ -0,0 +1,72 @@
+# Generated by Django 4.2.6 on 2026-10-18 21:30
+
+import gzip
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+SET_SEARCH_VECTORS_SQL = '''
+    UPDATE posts_post SET search_vector =
+        setweight(to_tsvector(%(config)s, posts_post.title), 'A')
+        || setweight(to_tsvector(%(config)s, texts.text), 'B')
+    FROM unnest(%(ids)s::bigint[], %(texts)s::text[]) AS texts (id, text)
+    WHERE posts_post.id = texts.id
+'''
+
+
+def iter_batches(queryset):
+    """Yields the lists of the objects of the queryset by batches."""
+    batch = []
+    for obj in queryset.iterator(chunk_size=BATCH_SIZE):
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def set_search_vectors(apps, schema_editor):
+    """Sets the search vectors of the posts already in the blobs table
+    by one query per batch, by the models of this migration."""
+    Blob = apps.get_model('posts', 'Blob')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('id', 'text_digest').order_by('id')
+    for batch in iter_batches(posts):
+        texts = {}
+        for digest, encoding, data in Blob.objects.filter(
+            digest__in={post.text_digest for post in batch}
+        ).values_list('digest', 'encoding', 'data'):
+            data = bytes(data)
+            if encoding == 'gzip':
+                data = gzip.decompress(data)
+            texts[digest] = data.decode()[:settings.SEARCH_TEXT_MAX_LENGTH]
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(SET_SEARCH_VECTORS_SQL, {
+                'config': settings.SEARCH_CONFIG,
+                'ids': [post.id for post in batch],
+                'texts': [texts.get(post.text_digest, '') for post in batch]
+            })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_alter_report_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='full-text search vector of the title and the text'),
+        ),
+        migrations.RunPython(set_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.6 on 2026-10-18 21:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+INDEX_REPORTS_SQL = '''
+    INSERT INTO posts_reporttag (tag_id, report_id, expire_time)
+    SELECT post_tag.tag_id, report.id, report.expire_time
+    FROM posts_report AS report
+    JOIN posts_post_tags AS post_tag ON post_tag.post_id = report.post_id
+'''
+
+COUNT_TAGS_SQL = '''
+    UPDATE posts_tag SET
+        post_count = (
+            SELECT count(*) FROM posts_post_tags
+            WHERE posts_post_tags.tag_id = posts_tag.id
+        ),
+        report_count = (
+            SELECT count(*) FROM posts_reporttag
+            WHERE posts_reporttag.tag_id = posts_tag.id
+        )
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='number of the posts with the tag'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='report_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='number of the public reports with the tag'),
+        ),
+        migrations.CreateModel(
+            name='ReportTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expire_time', models.DateTimeField(verbose_name='expire time of the report')),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_index', to='posts.report', verbose_name='report of the post with the tag')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_index', to='posts.tag', verbose_name='tag of the reported post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'expire_time', 'report'], name='report_tag_expire_time_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reporttag',
+            constraint=models.UniqueConstraint(fields=('report', 'tag'), name='report_tag_unique'),
+        ),
+        migrations.RunSQL(INDEX_REPORTS_SQL, migrations.RunSQL.noop),
+        migrations.RunSQL(COUNT_TAGS_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.6 on 2026-10-18 22:00
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+SET_TAG_IDS_SQL = '''
+    UPDATE posts_post SET tag_ids = ARRAY(
+        SELECT tag_id FROM posts_post_tags
+        WHERE posts_post_tags.post_id = posts_post.id
+        ORDER BY tag_id
+    )
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_tag_counts_report_tag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None, verbose_name='ids of the tags, rendered without the tags table'),
+        ),
+        migrations.RunSQL(SET_TAG_IDS_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.6 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+SET_ACTIVE_REPORTS_SQL = '''
+    UPDATE posts_post SET
+        active_report_count = reports.count,
+        public_until = reports.until
+    FROM (
+        SELECT post_id, count(*) AS count, max(expire_time) AS until
+        FROM posts_report
+        WHERE expire_time >= now()
+        GROUP BY post_id
+    ) AS reports
+    WHERE reports.post_id = posts_post.id
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_tag_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='active_report_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='number of the unexpired reports of the post'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='public_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='latest expire time of the reports of the post'),
+        ),
+        migrations.RunSQL(SET_ACTIVE_REPORTS_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('active_report_count__gt', 0)), fields=['author', '-created_at', '-id'], name='post_author_public_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.6 on 2026-10-18 19:58
+
+import gzip
+
+from django.conf import settings
+from django.db import migrations, models
+
+DIGEST_BATCH_SIZE = 1000
+
+
+def set_text_previews(apps, schema_editor):
+    """Sets the previews of the texts of the posts sharing each text
+    by one query, the texts are read from the blobs table of this
+    migration by batches."""
+    Blob = apps.get_model('posts', 'Blob')
+    Post = apps.get_model('posts', 'Post')
+    digests = list(
+        Post.objects.exclude(text_digest='').order_by().values_list(
+            'text_digest',
+            flat=True
+        ).distinct()
+    )
+    for start in range(0, len(digests), DIGEST_BATCH_SIZE):
+        for digest, encoding, data in Blob.objects.filter(
+            digest__in=digests[start:start + DIGEST_BATCH_SIZE]
+        ).values_list('digest', 'encoding', 'data'):
+            data = bytes(data)
+            if encoding == 'gzip':
+                data = gzip.decompress(data)
+            Post.objects.filter(text_digest=digest).update(
+                text_preview=data.decode()[:settings.TEXT_PREVIEW_LENGTH]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_active_reports'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='text_preview',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='beginning of the text, rendered by the lists'),
+        ),
+        migrations.RunPython(set_text_previews, migrations.RunPython.noop),
+    ]
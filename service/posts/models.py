@@ -1,10 +1,53 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchVector,
+    SearchVectorCombinable,
+    SearchVectorField
+)
+from django.db import connection, models
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from posts.blobs import get_blob_store, get_digest
+from posts.compression import IDENTITY, compress, decompress
+from posts.slugs import generate_slug
 
 
 User = get_user_model()
 
 
+class SearchVectorFilter(SearchVectorCombinable, models.Func):
+    """Keeps only the lexemes of the given weights of the vector."""
+
+    function = 'ts_filter'
+    output_field = SearchVectorField()
+
+    def __init__(self, expression, weights):
+        super().__init__(
+            expression,
+            models.Value('{%s}' % ','.join(weights))
+        )
+
+
+class TagQuerySet(models.QuerySet):
+    def add_counts(self, field, deltas):
+        """Adds the deltas to the counter field of the tags by their
+        ids, the tags with the same delta are updated by one query."""
+        tag_ids_by_delta = defaultdict(list)
+        for tag_id, delta in deltas.items():
+            if delta:
+                tag_ids_by_delta[delta].append(tag_id)
+        for delta, tag_ids in tag_ids_by_delta.items():
+            self.filter(id__in=tag_ids).update(
+                **{field: Greatest(models.F(field) + delta, 0)}
+            )
+
+
 class Tag(models.Model):
     name = models.CharField(
         verbose_name='name of the tag',
@@ -13,6 +56,16 @@ class Tag(models.Model):
 
     )
     description = models.TextField(verbose_name='description of tag')
+    post_count = models.PositiveIntegerField(
+        verbose_name='number of the posts with the tag',
+        default=0
+    )
+    report_count = models.PositiveIntegerField(
+        verbose_name='number of the public reports with the tag',
+        default=0
+    )
+
+    objects = TagQuerySet.as_manager()
 
     class Meta:
         ordering = ['name']
@@ -21,13 +74,93 @@ class Tag(models.Model):
         return self.name
 
 
+class Blob(models.Model):
+    digest = models.CharField(
+        verbose_name='SHA-256 digest of the data',
+        max_length=64,
+        primary_key=True
+    )
+    encoding = models.CharField(
+        verbose_name='encoding of the data',
+        max_length=16,
+        default=IDENTITY
+    )
+    data = models.BinaryField(verbose_name='data of the blob')
+    created_at = models.DateTimeField(
+        verbose_name='blob creation date',
+        auto_now_add=True
+    )
+
+
+class PostQuerySet(models.QuerySet):
+    def touch(self):
+        """Increments the version of the posts, whose representation
+        is changed by their reports, and recounts their active reports
+        by the same query."""
+        now = timezone.now()
+        active_reports = Report.objects.filter(
+            post_id=models.OuterRef('id'),
+            expire_time__gte=now
+        ).order_by().values('post_id')
+        return self.update(
+            version=models.F('version') + 1,
+            updated_at=now,
+            active_report_count=Coalesce(
+                models.Subquery(
+                    active_reports.annotate(
+                        count=models.Count('id')
+                    ).values('count')
+                ),
+                0
+            ),
+            public_until=models.Subquery(
+                active_reports.annotate(
+                    until=models.Max('expire_time')
+                ).values('until')
+            )
+        )
+
+    def public(self, is_public=True):
+        """Returns the posts having the unexpired reports, or the posts
+        having none, the public ones are read by the partial index."""
+        public_lookups = {
+            'active_report_count__gt': 0,
+            'public_until__gte': timezone.now()
+        }
+        if is_public:
+            return self.filter(**public_lookups)
+        return self.exclude(**public_lookups)
+
+
 class Post(models.Model):
     title = models.CharField(verbose_name='title of the post', max_length=200)
-    text = models.TextField(verbose_name='text of the post')
+    text_digest = models.CharField(
+        verbose_name='digest of the text in the blob store',
+        max_length=64,
+        db_index=True
+    )
+    text_size = models.PositiveIntegerField(
+        verbose_name='size of the text in bytes',
+        default=0
+    )
+    text_preview = models.CharField(
+        verbose_name='beginning of the text, rendered by the lists',
+        max_length=settings.TEXT_PREVIEW_LENGTH,
+        blank=True,
+        editable=False
+    )
     created_at = models.DateTimeField(
         verbose_name='post creation date',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='post modification date',
+        auto_now=True
+    )
+    version = models.PositiveIntegerField(
+        verbose_name='version of the post',
+        default=1
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -38,12 +171,230 @@ class Post(models.Model):
         Tag,
         verbose_name='related tags of the post'
     )
+    tag_ids = ArrayField(
+        models.BigIntegerField(),
+        verbose_name='ids of the tags, rendered without the tags table',
+        default=list,
+        blank=True,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='full-text search vector of the title and the text',
+        null=True,
+        editable=False
+    )
+    active_report_count = models.PositiveIntegerField(
+        verbose_name='number of the unexpired reports of the post',
+        default=0,
+        editable=False
+    )
+    public_until = models.DateTimeField(
+        verbose_name='latest expire time of the reports of the post',
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['author', '-created_at', '-id'],
+                name='post_author_created_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='post_search_vector_idx'),
+            models.Index(
+                fields=['author', '-created_at', '-id'],
+                condition=models.Q(active_report_count__gt=0),
+                name='post_author_public_idx'
+            ),
+        ]
+
+    report_fields = ('active_report_count', 'public_until')
+
+    _text = None
+    _text_blob = None
+    _text_changed = False
 
     def __str__(self):
         return self.title
 
+    @property
+    def is_public(self):
+        """Whether the post is shared by a report, which has not
+        yet arrived expire time."""
+        return (
+            self.public_until is not None
+            and self.public_until >= timezone.now()
+        )
+
+    @property
+    def text(self):
+        """The text of the post, loaded from the blob store
+        and decompressed on demand."""
+        if self._text is None and self.text_digest:
+            if self._text_blob is None:
+                self._text_blob = get_blob_store().get_many(
+                    [self.text_digest]
+                )[self.text_digest]
+            self._text = decompress(*self._text_blob).decode()
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value
+        self._text_changed = True
+
+    @staticmethod
+    def prefetch_texts(posts):
+        """Loads the texts of the posts from the blob store at once,
+        they are decompressed only when accessed."""
+        digests = {
+            post.text_digest
+            for post in posts
+            if post._text_blob is None and post.text_digest
+        }
+        if not digests:
+            return
+        blobs = get_blob_store().get_many(digests)
+        for post in posts:
+            if post._text_blob is None and post.text_digest:
+                post._text_blob = blobs[post.text_digest]
+
+    def set_tags(self, tags, created=False):
+        """Sets the tags of the post by adding and removing only the
+        changed ones, updates the post counts of the tags and the tag
+        index of the reports sharing the post. The just created post
+        has neither the tags nor the reports to be looked up.
+
+        The tag_ids copy of the tags is saved, unless it is already set
+        by the caller before the post was saved."""
+        PostTag = Post.tags.through
+        old_tag_ids = set()
+        if not created:
+            old_tag_ids = set(
+                PostTag.objects.filter(post_id=self.id).values_list(
+                    'tag_id',
+                    flat=True
+                )
+            )
+        new_tag_ids = {tag.id for tag in tags}
+        if sorted(new_tag_ids) != self.tag_ids:
+            self.tag_ids = sorted(new_tag_ids)
+            Post.objects.filter(id=self.id).update(tag_ids=self.tag_ids)
+        added = new_tag_ids - old_tag_ids
+        removed = old_tag_ids - new_tag_ids
+        if removed:
+            PostTag.objects.filter(
+                post_id=self.id,
+                tag_id__in=removed
+            ).delete()
+        if added:
+            PostTag.objects.bulk_create([
+                PostTag(post_id=self.id, tag_id=tag_id) for tag_id in added
+            ])
+        getattr(self, '_prefetched_objects_cache', {}).pop('tags', None)
+        if not added and not removed:
+            return
+        Tag.objects.add_counts('post_count', {
+            **dict.fromkeys(added, 1),
+            **dict.fromkeys(removed, -1)
+        })
+        if created:
+            return
+        report_ids = list(self.reports.values_list('id', flat=True))
+        if report_ids:
+            ReportTag.objects.index_reports(report_ids)
+
+    def update_search_vector(self):
+        """Sets the search vector expression computed by the database
+        on save, the title is weighted above the text. The vector of the
+        unchanged text is kept, so the text is not loaded for it."""
+        title_vector = SearchVector(
+            models.Value(self.title),
+            weight='A',
+            config=settings.SEARCH_CONFIG
+        )
+        if self._state.adding or self._text_changed:
+            text = (self._text or '')[:settings.SEARCH_TEXT_MAX_LENGTH]
+            self.search_vector = title_vector + SearchVector(
+                models.Value(text),
+                weight='B',
+                config=settings.SEARCH_CONFIG
+            )
+        else:
+            self.search_vector = title_vector + SearchVectorFilter(
+                models.F('search_vector'),
+                ['b']
+            )
+
+    @staticmethod
+    def put_texts(posts):
+        """Puts the changed texts of the posts in the blob store at once
+        and sets their digests, sizes and previews."""
+        blobs = {}
+        for post in posts:
+            if not post._text_changed:
+                continue
+            data = post._text.encode()
+            post.text_digest = get_digest(data)
+            post.text_size = len(data)
+            post.text_preview = post._text[:settings.TEXT_PREVIEW_LENGTH]
+            post._text_changed = False
+            blobs[post.text_digest] = compress(
+                data,
+                settings.BLOB_COMPRESS_MIN_SIZE
+            )
+        if blobs:
+            get_blob_store().put_many(blobs)
+
+    def save(self, *args, **kwargs):
+        """Puts the changed text in the blob store, updates the search
+        vector and increments the version of the changed post. The
+        columns of the reports kept by touch() are not written back
+        from the instance, which could be loaded before the touch.
+
+        The version is incremented by the database, as by touch(), and
+        loaded after the save with the columns of the reports, so that
+        no two states of the post share a version."""
+        update_fields = kwargs.get('update_fields')
+        self.update_search_vector()
+        self.put_texts([self])
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        self.version = models.F('version') + 1
+        if update_fields is None:
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.report_fields
+            ]
+        kwargs['update_fields'] = {
+            *update_fields,
+            'text_digest',
+            'text_size',
+            'text_preview',
+            'version',
+            'updated_at',
+            'search_vector'
+        }
+        super().save(*args, **kwargs)
+        self.refresh_from_db(
+            using=self._state.db,
+            fields=['version', *self.report_fields]
+        )
+
 
 class Report(models.Model):
+    slug = models.CharField(
+        verbose_name='short shareable address of the report',
+        max_length=16,
+        unique=True,
+        editable=False
+    )
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -51,6 +402,129 @@ class Report(models.Model):
         verbose_name='post that the author is sharing'
     )
     expire_time = models.DateTimeField(
-        verbose_name='when the post will no longer be available',
-        db_index=True
+        verbose_name='when the post will no longer be available'
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='report modification date',
+        auto_now=True
     )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['expire_time', 'id'],
+                name='report_expire_time_id_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.slug
+
+    @classmethod
+    def generate_unique_slugs(cls, count):
+        """Returns the list of the distinct random slugs, which are not
+        taken yet, checking them against the table by one query."""
+        slugs = set()
+        while len(slugs) < count:
+            candidates = {
+                generate_slug(settings.REPORT_SLUG_LENGTH)
+                for _ in range(count - len(slugs))
+            } - slugs
+            slugs |= candidates - set(
+                cls.objects.filter(slug__in=candidates).values_list(
+                    'slug',
+                    flat=True
+                )
+            )
+        return list(slugs)
+
+    def save(self, *args, **kwargs):
+        """Assigns the slug to the new report."""
+        if not self.slug:
+            self.slug = self.generate_unique_slugs(1)[0]
+        super().save(*args, **kwargs)
+
+
+class ReportTagQuerySet(models.QuerySet):
+    def unindex_reports(self, report_ids):
+        """Deletes the rows of the reports and decrements
+        the report counts of their tags."""
+        deltas = Counter()
+        for tag_id in self._delete_returning_tag_ids(report_ids):
+            deltas[tag_id] -= 1
+        Tag.objects.add_counts('report_count', deltas)
+
+    def index_reports(self, report_ids, created=False):
+        """Rebuilds the rows of the reports from the tags and the
+        expire times of their posts and updates the report counts
+        of the tags by the difference, the rows of the just created
+        reports are only inserted."""
+        deltas = Counter()
+        if not created:
+            for tag_id in self._delete_returning_tag_ids(report_ids):
+                deltas[tag_id] -= 1
+        for tag_id in self._insert_returning_tag_ids(report_ids):
+            deltas[tag_id] += 1
+        Tag.objects.add_counts('report_count', deltas)
+
+    def _delete_returning_tag_ids(self, report_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {ReportTag._meta.db_table} '
+                f'WHERE report_id = ANY(%s) RETURNING tag_id',
+                [list(report_ids)]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def _insert_returning_tag_ids(self, report_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {ReportTag._meta.db_table} '
+                f'(tag_id, report_id, expire_time) '
+                f'SELECT post_tag.tag_id, report.id, report.expire_time '
+                f'FROM {Report._meta.db_table} AS report '
+                f'JOIN {Post.tags.through._meta.db_table} AS post_tag '
+                f'ON post_tag.post_id = report.post_id '
+                f'WHERE report.id = ANY(%s) '
+                f'ON CONFLICT DO NOTHING RETURNING tag_id',
+                [list(report_ids)]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class ReportTag(models.Model):
+    """The denormalized index of the reports by the tags of their
+    posts, the reports of the tag are read by the index scan in the
+    order of the expire time, as in the list of the reports."""
+
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='report_index',
+        verbose_name='tag of the reported post'
+    )
+    report = models.ForeignKey(
+        Report,
+        on_delete=models.CASCADE,
+        related_name='tag_index',
+        verbose_name='report of the post with the tag'
+    )
+    expire_time = models.DateTimeField(
+        verbose_name='expire time of the report'
+    )
+
+    objects = ReportTagQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['report', 'tag'],
+                name='report_tag_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['tag', 'expire_time', 'report'],
+                name='report_tag_expire_time_idx'
+            ),
+        ]
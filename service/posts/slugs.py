@@ -0,0 +1,11 @@
+import secrets
+import string
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+
+
+def generate_slug(length):
+    """Returns the random base62 slug of the given length."""
+    return ''.join(
+        secrets.choice(BASE62_ALPHABET) for _ in range(length)
+    )